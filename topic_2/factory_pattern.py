@@ -1,5 +1,23 @@
+import atexit
+import importlib
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+import unittest
 from abc import ABC, abstractmethod
 
+# Only modules needed to define the classes are imported here. The others
+# are imported where they are used, so importing this module stays cheap.
+
+# Run as a script this module is __main__. Register it under its own name as
+# well, so modules that import factory_pattern, such as structured_log, get
+# these classes rather than a second copy of them.
+if __name__ == "__main__":
+    sys.modules.setdefault("factory_pattern", sys.modules[__name__])
+
 # Logger interface
 class Logger(ABC):
     """
@@ -20,15 +38,184 @@ class Logger(ABC):
         pass
 
 
+# BufferedLogger class
+class BufferedLogger(Logger):
+    """
+    Base class for loggers that write records in batches from a background thread.
+
+    Records are handed to a writer thread through a queue. The writer
+    collects them into batches and writes a batch when it reaches
+    ``batch_size`` records or when ``flush_interval`` seconds have passed
+    since the first record of the batch was queued. Subclasses implement
+    ``_write_batch`` and ``_close_sink``. A batch that fails to write is
+    reported on stderr, counted in ``failed`` and dropped, and the writer
+    keeps going with the next one.
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_size: int = 512, flush_interval: float = 0.5) -> None:
+        """
+        Start the background writer thread.
+
+        Args:
+            batch_size (int): The number of records written per batch.
+            flush_interval (float): The maximum time in seconds a record waits before being written.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # The number of records dropped because their batch failed to write
+        self.failed = 0
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._writer = threading.Thread(
+            target=self._run, name=f"{type(self).__name__}Writer", daemon=True
+        )
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _enqueue(self, record) -> None:
+        """Hand a record to the writer thread."""
+        if self._closed:
+            raise ValueError(f"Cannot log to a closed {type(self).__name__}")
+        if not self._writer.is_alive():
+            raise RuntimeError(f"The writer thread of {type(self).__name__} has stopped")
+        self._queue.put(record)
+
+    def flush(self) -> None:
+        """
+        Block until every record queued so far has been written.
+
+        Returns:
+            None
+        """
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        while not done.wait(0.1):
+            if not self._writer.is_alive():
+                raise RuntimeError(f"The writer thread of {type(self).__name__} has stopped")
+
+    def close(self) -> None:
+        """
+        Write all pending records, stop the writer thread and close the sink.
+
+        Returns:
+            None
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(self._STOP)
+        self._writer.join()
+        self._close_sink()
+        atexit.unregister(self.close)
+
+    def _run(self) -> None:
+        """Writer thread loop: collect records into batches and write them."""
+        batch = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._drain(batch)
+                continue
+
+            if item is self._STOP:
+                self._drain(batch)
+                return
+            if isinstance(item, threading.Event):
+                self._drain(batch)
+                item.set()
+                continue
+            if not batch:
+                deadline = time.monotonic() + self.flush_interval
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._drain(batch)
+
+    def _drain(self, batch: list) -> None:
+        """Write the batch if it has records and empty it, reporting a failed write."""
+        if not batch:
+            return
+        try:
+            self._write_batch(batch)
+        except Exception:
+            self.failed += len(batch)
+            traceback.print_exc()
+        finally:
+            batch.clear()
+
+    @abstractmethod
+    def _write_batch(self, batch: list) -> None:
+        """Write a non-empty batch of records to the sink."""
+
+    @abstractmethod
+    def _close_sink(self) -> None:
+        """Release the sink once the writer thread has stopped."""
+
+
 # FileLogger class
-class FileLogger(Logger):
+class FileLogger(BufferedLogger):
     """
     Represents a logger that logs messages to a file.
+
+    The file is kept open and written in batches by a background writer
+    thread. When ``max_bytes`` or ``rotate_interval`` is set, the writer
+    rolls the file over between batches by renaming it to a timestamped
+    segment, so no line is split or lost. Rotated segments are gzip
+    compressed and pruned to ``backup_count`` by a separate maintenance
+    thread, so neither the writer nor ``log()`` callers wait for it.
     """
 
+    def __init__(
+        self,
+        file_path: str = "logs.txt",
+        batch_size: int = 512,
+        flush_interval: float = 0.5,
+        max_bytes: int = 0,
+        rotate_interval: float = 0,
+        backup_count: int = 0,
+        compress: bool = True,
+    ) -> None:
+        """
+        Open the log file and start the background writer thread.
+
+        Args:
+            file_path (str): The path of the log file.
+            batch_size (int): The number of records written per batch.
+            flush_interval (float): The maximum time in seconds a record waits before being written.
+            max_bytes (int): Roll the file over once it reaches this size. 0 disables size rotation.
+            rotate_interval (float): Roll the file over after this many seconds. 0 disables time rotation.
+            backup_count (int): The number of rotated segments to keep. 0 keeps them all.
+            compress (bool): Gzip rotated segments.
+        """
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self._file = open(file_path, "a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+        self._maintenance = None
+        if max_bytes or rotate_interval:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._maintenance = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="FileLoggerMaintenance"
+            )
+        super().__init__(batch_size, flush_interval)
+
     def log(self, message: str) -> None:
         """
-        Log the message to a file.
+        Queue the message to be written to the file.
 
         Args:
             message (str): The message to be logged.
@@ -36,9 +223,79 @@ class FileLogger(Logger):
         Returns:
             None
         """
-        with open("logs.txt", "a", encoding="utf-8") as file:
-            file.write(f"File Logger: {message}\n")
-        print(f"Logged to File: {message}")
+        self._enqueue(f"File Logger: {message}\n")
+
+    def segments(self) -> list:
+        """
+        Get the rotated segments of the log file, oldest first.
+
+        Returns:
+            list: The paths of the rotated segments.
+        """
+        import glob
+
+        paths = [
+            path
+            for path in glob.glob(glob.escape(self.file_path) + ".*")
+            if not path.endswith(".tmp")
+        ]
+        return sorted(paths, key=lambda path: path.removesuffix(".gz"))
+
+    def _write_batch(self, batch: list) -> None:
+        """Write the batch to the file and roll it over if a threshold is reached."""
+        self._file.writelines(batch)
+        self._file.flush()
+        if self._should_rotate():
+            self._rotate()
+
+    def _should_rotate(self) -> bool:
+        """Check whether the current file has reached a rotation threshold."""
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        if self.rotate_interval:
+            return time.monotonic() - self._opened_at >= self.rotate_interval
+        return False
+
+    def _rotate(self) -> None:
+        """Rename the current file to a new segment and reopen the log file."""
+        from datetime import datetime
+
+        self._file.close()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        segment = f"{self.file_path}.{stamp}"
+        while os.path.exists(segment) or os.path.exists(segment + ".gz"):
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            segment = f"{self.file_path}.{stamp}"
+        os.replace(self.file_path, segment)
+        self._file = open(self.file_path, "a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+        try:
+            self._maintenance.submit(self._maintain, segment)
+        except RuntimeError:
+            # The executor takes no work once the interpreter is shutting
+            # down, e.g. when the last batch is written from atexit.
+            self._maintain(segment)
+
+    def _maintain(self, segment: str) -> None:
+        """Compress a rotated segment and remove segments beyond the retention limit."""
+        if self.compress and os.path.exists(segment):
+            import gzip
+            import shutil
+
+            compressed = segment + ".gz"
+            with open(segment, "rb") as source, gzip.open(compressed + ".tmp", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.replace(compressed + ".tmp", compressed)
+            os.remove(segment)
+        if self.backup_count:
+            for path in self.segments()[: -self.backup_count]:
+                os.remove(path)
+
+    def _close_sink(self) -> None:
+        """Close the log file and wait for pending compression and retention work."""
+        self._file.close()
+        if self._maintenance:
+            self._maintenance.shutdown(wait=True)
 
 
 # ConsoleLogger class
@@ -61,51 +318,747 @@ class ConsoleLogger(Logger):
 
 
 # DatabaseLogger class
-class DatabaseLogger(Logger):
+class DatabaseLogger(BufferedLogger):
     """
     Represents a logger that logs messages to the database.
+
+    Records are stored in a local SQLite database opened in WAL mode. A
+    single connection is reused by the background writer thread, which
+    inserts each batch with one prepared ``executemany`` statement inside
+    a transaction. The ``logs`` table is indexed on timestamp, level and
+    logger so time-range queries do not scan the whole table.
     """
 
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY,
+            timestamp REAL NOT NULL,
+            level TEXT NOT NULL,
+            logger TEXT NOT NULL,
+            message TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_level_timestamp ON logs (level, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_logger_timestamp ON logs (logger, timestamp)",
+    )
+    _INSERT = "INSERT INTO logs (timestamp, level, logger, message) VALUES (?, ?, ?, ?)"
+
+    def __init__(
+        self,
+        db_path: str = "logs.db",
+        logger_name: str = "app",
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+    ) -> None:
+        """
+        Open the database, create the schema and start the background writer thread.
+
+        Args:
+            db_path (str): The path of the SQLite database file.
+            logger_name (str): The logger name stored with every record.
+            batch_size (int): The number of records inserted per transaction.
+            flush_interval (float): The maximum time in seconds a record waits before being inserted.
+        """
+        self.db_path = db_path
+        self.logger_name = logger_name
+        import sqlite3
+
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            for statement in self._SCHEMA:
+                self._connection.execute(statement)
+        super().__init__(batch_size, flush_interval)
+
+    def log(self, message: str, level: str = "INFO") -> None:
+        """
+        Queue the message to be inserted into the database.
+
+        Args:
+            message (str): The message to be logged.
+            level (str): The severity level of the message.
+
+        Returns:
+            None
+        """
+        self._enqueue((time.time(), level, self.logger_name, message))
+
+    def query(
+        self,
+        start: float = None,
+        end: float = None,
+        level: str = None,
+        logger_name: str = None,
+    ) -> list:
+        """
+        Get the records logged in a time range, oldest first.
+
+        Records still waiting in the queue are not included; call flush() first
+        to see them.
+
+        Args:
+            start (float): The earliest timestamp to include, or None for no lower bound.
+            end (float): The timestamp to stop before, or None for no upper bound.
+            level (str): Only include records with this level.
+            logger_name (str): Only include records from this logger.
+
+        Returns:
+            list: (timestamp, level, logger, message) tuples.
+        """
+        clauses, params = [], []
+        for clause, value in (
+            ("timestamp >= ?", start),
+            ("timestamp < ?", end),
+            ("level = ?", level),
+            ("logger = ?", logger_name),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        sql = "SELECT timestamp, level, logger, message FROM logs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp"
+        import sqlite3
+
+        connection = sqlite3.connect(self.db_path)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def _write_batch(self, batch: list) -> None:
+        """Insert the batch in a single transaction."""
+        with self._connection:
+            self._connection.executemany(self._INSERT, batch)
+
+    def _close_sink(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+
+# AsyncLogger class
+class AsyncLogger(Logger):
+    """
+    Represents a logger that hands messages to another logger asynchronously.
+
+    Messages are stored in a preallocated bounded ring buffer and delivered to
+    the wrapped sink logger by a background thread, so callers do not wait
+    for a slow sink. When the buffer is full the overload policy decides
+    what happens:
+
+    - "block": the caller waits until there is room.
+    - "drop_newest": the incoming message is dropped.
+    - "drop_oldest": the oldest buffered message is overwritten.
+    - "sample": one in every ``sample_rate`` incoming messages replaces the
+      oldest buffered message, the rest are dropped.
+
+    A message the sink fails to log is reported on stderr and counted in
+    ``failed``; delivery carries on with the next message.
+    """
+
+    OVERLOAD_POLICIES = ("block", "drop_newest", "drop_oldest", "sample")
+
+    def __init__(
+        self,
+        sink: Logger,
+        capacity: int = 1024,
+        overload_policy: str = "block",
+        sample_rate: int = 10,
+    ) -> None:
+        """
+        Allocate the ring buffer and start the delivery thread.
+
+        Args:
+            sink (Logger): The logger the messages are delivered to.
+            capacity (int): The number of messages the buffer can hold.
+            overload_policy (str): What to do when the buffer is full.
+            sample_rate (int): Keep one in this many messages under the "sample" policy.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if overload_policy not in self.OVERLOAD_POLICIES:
+            raise ValueError(f"Invalid overload policy: {overload_policy}")
+        if sample_rate < 1:
+            raise ValueError("sample_rate must be at least 1")
+        self.sink = sink
+        self.capacity = capacity
+        self.overload_policy = overload_policy
+        self.sample_rate = sample_rate
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self._buffer = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._overflow_count = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._delivering = False
+        self._worker = threading.Thread(
+            target=self._run, name="AsyncLoggerWorker", daemon=True
+        )
+        self._worker.start()
+        atexit.register(self.close)
+
+    @property
+    def depth(self) -> int:
+        """int: The number of messages waiting in the buffer."""
+        return self._size
+
+    def stats(self) -> dict:
+        """
+        Get the delivery counters of the logger.
+
+        Returns:
+            dict: The enqueued, dropped, flushed and failed counts and the current queue depth.
+        """
+        with self._lock:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "flushed": self.flushed,
+                "failed": self.failed,
+                "depth": self._size,
+            }
+
     def log(self, message: str) -> None:
         """
-        Log the message to the database.
+        Put the message in the ring buffer, applying the overload policy if it is full.
+
+        Args:
+            message (str): The message to be logged.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("Cannot log to a closed AsyncLogger")
+            if self._size == self.capacity:
+                if self.overload_policy == "block":
+                    while self._size == self.capacity and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        raise ValueError("Cannot log to a closed AsyncLogger")
+                elif self.overload_policy == "drop_newest":
+                    self.dropped += 1
+                    return
+                else:
+                    if self.overload_policy == "sample":
+                        self._overflow_count += 1
+                        if self._overflow_count % self.sample_rate:
+                            self.dropped += 1
+                            return
+                    self._head = (self._head + 1) % self.capacity
+                    self._size -= 1
+                    self.dropped += 1
+            self._buffer[(self._head + self._size) % self.capacity] = message
+            self._size += 1
+            self.enqueued += 1
+            self._not_empty.notify()
+
+    def flush(self) -> None:
+        """
+        Block until every buffered message has been delivered to the sink.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            while (self._size or self._delivering) and self._worker.is_alive():
+                self._idle.wait()
+        if hasattr(self.sink, "flush"):
+            self.sink.flush()
+
+    def close(self) -> None:
+        """
+        Deliver the buffered messages, stop the delivery thread and close the sink.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        self._worker.join()
+        if hasattr(self.sink, "close"):
+            self.sink.close()
+        atexit.unregister(self.close)
+
+    def _run(self) -> None:
+        """Delivery thread loop: take messages from the buffer and log them to the sink."""
+        while True:
+            with self._lock:
+                while not self._size and not self._closed:
+                    self._not_empty.wait()
+                if not self._size:
+                    self._idle.notify_all()
+                    return
+                message = self._buffer[self._head]
+                self._buffer[self._head] = None
+                self._head = (self._head + 1) % self.capacity
+                self._size -= 1
+                self._delivering = True
+                self._not_full.notify()
+            try:
+                self.sink.log(message)
+                delivered = True
+            except Exception:
+                delivered = False
+                traceback.print_exc()
+            with self._lock:
+                self._delivering = False
+                if delivered:
+                    self.flushed += 1
+                else:
+                    self.failed += 1
+                if not self._size:
+                    self._idle.notify_all()
+
+
+# SharedLogger class
+class SharedLogger(Logger):
+    """
+    A caller's handle on a logger cached by LoggerFactory.
+
+    Every create_logger() call returns its own handle on the shared logger.
+    Closing a handle writes the records queued so far and detaches the
+    handle, but leaves the logger open for its other holders; only
+    LoggerFactory.clear_cache() closes cached loggers. Other attributes,
+    such as flush() or stats(), are those of the shared logger.
+    """
+
+    def __init__(self, logger: Logger) -> None:
+        self.logger = logger
+        self._closed = False
+
+    def log(self, message: str, *args, **kwargs) -> None:
+        """
+        Log the message through the shared logger.
 
         Args:
             message (str): The message to be logged.
+            *args, **kwargs: Extra arguments of the shared logger's log(), such as a level.
+
+        Returns:
+            None
+        """
+        if self._closed:
+            raise ValueError(f"Cannot log to a closed handle on {type(self.logger).__name__}")
+        self.logger.log(message, *args, **kwargs)
+
+    def close(self) -> None:
+        """
+        Write the records queued so far and detach this handle, leaving the shared logger open.
 
         Returns:
             None
         """
-        # Code to log the message to the database
-        print(f"Logged to Database: {message}")
+        if self._closed:
+            return
+        self._closed = True
+        flush = getattr(self.logger, "flush", None)
+        if flush is not None:
+            flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self.logger, name)
 
 
 # LoggerFactory class
 class LoggerFactory:
     """
     Factory class to create different types of loggers.
+
+    Logger types map to a Logger class, to a dotted path such as
+    ``"package.module:ClassName"``, or to an entry point. Paths and entry
+    points are imported only the first time their type is requested.
+    Loggers are cached per (type, config), so every caller asking for the
+    same logger shares one thread-safe instance. Callers get a SharedLogger
+    handle on it, whose close() does not close the logger for the others;
+    clear_cache() closes the cached loggers.
     """
 
+    ENTRY_POINT_GROUP = "factory_pattern.loggers"
+
     loggers = {
         "file": FileLogger,
         "console": ConsoleLogger,
         "database": DatabaseLogger,
+        "structured": "structured_log:StructuredLogger",
     }
 
-    def create_logger(self, logger_type: str) -> Logger:
+    _instances = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, logger_type: str, target) -> None:
+        """
+        Register a logger type.
+
+        Args:
+            logger_type (str): The name of the logger type.
+            target: A Logger subclass, a dotted path to one, or an entry point to load it from.
+
+        Returns:
+            None
         """
-        Create a logger based on the logger type.
+        with cls._lock:
+            cls.loggers[logger_type] = target
+
+    @classmethod
+    def load_entry_points(cls, group: str = ENTRY_POINT_GROUP) -> None:
+        """
+        Register the logger types advertised by installed packages, without importing them.
+
+        Args:
+            group (str): The entry point group to read.
+
+        Returns:
+            None
+        """
+        import importlib.metadata
+
+        for entry_point in importlib.metadata.entry_points(group=group):
+            cls.register(entry_point.name, entry_point)
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """
+        Close and forget every cached logger.
+
+        Returns:
+            None
+        """
+        with cls._lock:
+            instances = list(cls._instances.values())
+            cls._instances.clear()
+        for logger in instances:
+            if hasattr(logger, "close"):
+                logger.close()
+
+    def create_logger(
+        self,
+        logger_type: str,
+        config: dict = None,
+        async_mode: bool = False,
+        **async_options,
+    ) -> Logger:
+        """
+        Create a logger based on the logger type, or return the cached one.
 
         Args:
             logger_type (str): The type of logger to be created.
+            config (dict): Keyword arguments for the logger class. Values must be hashable.
+            async_mode (bool): Wrap the logger in an AsyncLogger so callers never wait for the sink.
+            **async_options: Options passed to AsyncLogger, such as capacity and overload_policy.
 
         Returns:
-            Logger: An instance of the specified logger type.
+            SharedLogger: A handle on the cached logger of the specified type.
         """
-        logger_class = self.loggers.get(logger_type)
-        if logger_class:
-            return logger_class()
-        raise ValueError("Invalid logger type")
+        config = config or {}
+        key = (
+            logger_type,
+            frozenset(config.items()),
+            async_mode,
+            frozenset(async_options.items()),
+        )
+        logger = self._instances.get(key)
+        if logger is not None and not getattr(logger, "_closed", False):
+            return SharedLogger(logger)
+
+        with self._lock:
+            logger = self._instances.get(key)
+            if logger is None or getattr(logger, "_closed", False):
+                logger = self._resolve(logger_type)(**config)
+                if async_mode:
+                    logger = AsyncLogger(logger, **async_options)
+                self._instances[key] = logger
+            return SharedLogger(logger)
+
+    def _resolve(self, logger_type: str) -> type:
+        """Get the logger class of a type, importing and memoizing it on first use."""
+        target = self.loggers.get(logger_type)
+        if target is None:
+            raise ValueError("Invalid logger type")
+        if hasattr(target, "load"):
+            # An importlib.metadata.EntryPoint, checked without importing importlib.metadata.
+            target = target.load()
+        elif isinstance(target, str):
+            module_name, _, class_name = target.rpartition(":")
+            if not module_name:
+                module_name, _, class_name = target.rpartition(".")
+            target = getattr(importlib.import_module(module_name), class_name)
+        if not (isinstance(target, type) and issubclass(target, Logger)):
+            raise TypeError(f"{logger_type!r} does not refer to a Logger class")
+        self.loggers[logger_type] = target
+        return target
+
+
+class TestBufferedLoggerErrors(unittest.TestCase):
+    def test_writer_survives_failed_batch(self):
+        """A failing write drops its batch but the writer keeps writing and flushing."""
+        import sqlite3
+        import unittest.mock
+
+        class FlakyLogger(BufferedLogger):
+            def __init__(self):
+                self.written = []
+                self.fail_next = True
+                super().__init__(batch_size=2, flush_interval=0.01)
+
+            def log(self, message):
+                self._enqueue(message)
+
+            def _write_batch(self, batch):
+                if self.fail_next:
+                    self.fail_next = False
+                    raise sqlite3.OperationalError("database is locked")
+                self.written.extend(batch)
+
+            def _close_sink(self):
+                pass
+
+        logger = FlakyLogger()
+        with unittest.mock.patch("traceback.print_exc"):
+            logger.log("lost-1")
+            logger.log("lost-2")
+            logger.flush()
+            logger.log("kept")
+            logger.flush()
+        self.assertTrue(logger._writer.is_alive())
+        self.assertEqual(logger.written, ["kept"])
+        self.assertEqual(logger.failed, 2)
+        logger.close()
+
+
+class _GatedSink(Logger):
+    """A sink that holds its first message until released, so tests can fill the buffer."""
+
+    def __init__(self, fail_on=()):
+        self.messages = []
+        self.fail_on = set(fail_on)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def log(self, message):
+        self.entered.set()
+        self.release.wait()
+        if message in self.fail_on:
+            raise OSError(f"cannot log {message}")
+        self.messages.append(message)
+
+
+class TestAsyncLogger(unittest.TestCase):
+    def _fill(self, overload_policy, count, **options):
+        """Log count messages into a capacity-2 logger whose sink is stuck on the first one."""
+        sink = _GatedSink()
+        logger = AsyncLogger(sink, capacity=2, overload_policy=overload_policy, **options)
+        logger.log("m0")
+        sink.entered.wait()
+        for i in range(1, count):
+            logger.log(f"m{i}")
+        return sink, logger
+
+    def _finish(self, sink, logger):
+        sink.release.set()
+        logger.close()
+        return logger.stats()
+
+    def test_drop_newest(self):
+        sink, logger = self._fill("drop_newest", 5)
+        stats = self._finish(sink, logger)
+        self.assertEqual(sink.messages, ["m0", "m1", "m2"])
+        self.assertEqual((stats["enqueued"], stats["dropped"], stats["flushed"]), (3, 2, 3))
+
+    def test_drop_oldest(self):
+        sink, logger = self._fill("drop_oldest", 5)
+        stats = self._finish(sink, logger)
+        self.assertEqual(sink.messages, ["m0", "m3", "m4"])
+        self.assertEqual((stats["enqueued"], stats["dropped"], stats["flushed"]), (5, 2, 3))
+
+    def test_sample(self):
+        sink, logger = self._fill("sample", 7, sample_rate=2)
+        stats = self._finish(sink, logger)
+        # Overflowing m3..m6: every second one (m4, m6) replaces the oldest
+        self.assertEqual(sink.messages, ["m0", "m4", "m6"])
+        self.assertEqual((stats["enqueued"], stats["dropped"], stats["flushed"]), (5, 4, 3))
+
+    def test_block(self):
+        sink, logger = self._fill("block", 3)
+        producer = threading.Thread(target=logger.log, args=("m3",))
+        producer.start()
+        producer.join(0.1)
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(logger.depth, 2)
+        sink.release.set()
+        producer.join()
+        stats = self._finish(sink, logger)
+        self.assertEqual(sink.messages, ["m0", "m1", "m2", "m3"])
+        self.assertEqual((stats["enqueued"], stats["dropped"], stats["flushed"]), (4, 0, 4))
+
+    def test_sink_error_is_counted_and_delivery_continues(self):
+        import unittest.mock
+
+        sink = _GatedSink(fail_on={"bad"})
+        sink.release.set()
+        logger = AsyncLogger(sink, capacity=2)
+        with unittest.mock.patch("traceback.print_exc"):
+            for message in ["a", "bad", "b", "c", "d"]:
+                logger.log(message)
+            logger.flush()
+        self.assertTrue(logger._worker.is_alive())
+        stats = self._finish(sink, logger)
+        self.assertEqual(sink.messages, ["a", "b", "c", "d"])
+        self.assertEqual((stats["flushed"], stats["failed"], stats["depth"]), (4, 1, 0))
+
+
+class TestLoggerFactory(unittest.TestCase):
+    def test_structured_logger_when_run_as_script(self):
+        """Running this module as __main__ must not load a second copy of it for plugins."""
+        import subprocess
+        import tempfile
+
+        script = (
+            "import runpy, sys\n"
+            "module = runpy.run_path(sys.argv[1], run_name='__main__')\n"
+            "logger = module['LoggerFactory']().create_logger('structured', {'directory': 'logs'})\n"
+            "logger.log('hello')\n"
+            "logger.close()\n"
+            "print(type(logger.logger).__name__)\n"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            result = subprocess.run(
+                [sys.executable, "-c", script, os.path.abspath(__file__)],
+                cwd=directory,
+                env={**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))},
+                capture_output=True,
+                text=True,
+                timeout=60,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(result.stdout.splitlines()[-1], "StructuredLogger")
+
+
+class TestSharedLogger(unittest.TestCase):
+    def test_closing_a_handle_keeps_the_shared_logger_open(self):
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "logs.txt")
+            factory = LoggerFactory()
+            self.addCleanup(LoggerFactory.clear_cache)
+            first = factory.create_logger("file", {"file_path": file_path})
+            second = factory.create_logger("file", {"file_path": file_path})
+            self.assertIsNot(first, second)
+            self.assertIs(first.logger, second.logger)
+
+            first.log("one")
+            first.close()
+            with self.assertRaises(ValueError):
+                first.log("after close")
+            second.log("two")
+            second.flush()
+            with open(file_path, encoding="utf-8") as file:
+                self.assertEqual(file.read(), "File Logger: one\nFile Logger: two\n")
+            self.assertFalse(second.logger._closed)
+            self.assertIs(factory.create_logger("file", {"file_path": file_path}).logger, second.logger)
+
+            LoggerFactory.clear_cache()
+            self.assertTrue(second.logger._closed)
+            third = factory.create_logger("file", {"file_path": file_path})
+            self.assertIsNot(third.logger, second.logger)
+
+
+class TestFileLoggerRotation(unittest.TestCase):
+    def test_rotation_under_concurrent_logging(self):
+        """Rotating while many threads log must not lose or duplicate lines."""
+        import gzip
+        import tempfile
+
+        threads_count, messages_per_thread = 8, 5000
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "logs.txt")
+            logger = FileLogger(
+                file_path, batch_size=64, flush_interval=0.01, max_bytes=20000
+            )
+
+            def worker(thread_id):
+                for i in range(messages_per_thread):
+                    logger.log(f"{thread_id}-{i}")
+
+            threads = [
+                threading.Thread(target=worker, args=(thread_id,))
+                for thread_id in range(threads_count)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            logger.close()
+
+            segments = logger.segments()
+            self.assertGreater(len(segments), 1)
+            lines = []
+            for segment in segments:
+                self.assertTrue(segment.endswith(".gz"))
+                with gzip.open(segment, "rt", encoding="utf-8") as file:
+                    lines.extend(file.read().splitlines())
+            with open(file_path, encoding="utf-8") as file:
+                lines.extend(file.read().splitlines())
+
+            expected = [
+                f"File Logger: {thread_id}-{i}"
+                for thread_id in range(threads_count)
+                for i in range(messages_per_thread)
+            ]
+            self.assertEqual(len(lines), len(expected))
+            self.assertEqual(sorted(lines), sorted(expected))
+
+    def test_rotation_after_executor_shutdown_compresses_inline(self):
+        import gzip
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "logs.txt")
+            logger = FileLogger(file_path, batch_size=1, max_bytes=1)
+            # What submit() sees once the interpreter is shutting down.
+            logger._maintenance.shutdown()
+            logger.log("last")
+            logger.close()
+
+            self.assertEqual(logger.failed, 0)
+            segments = logger.segments()
+            self.assertEqual(len(segments), 1)
+            with gzip.open(segments[0], "rt", encoding="utf-8") as file:
+                self.assertEqual(file.read(), "File Logger: last\n")
+
+    def test_retention_keeps_newest_segments(self):
+        import gzip
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "logs.txt")
+            logger = FileLogger(file_path, batch_size=1, max_bytes=1, backup_count=3)
+            for i in range(10):
+                logger.log(str(i))
+            logger.close()
+
+            segments = logger.segments()
+            self.assertEqual(len(segments), 3)
+            with gzip.open(segments[-1], "rt", encoding="utf-8") as file:
+                self.assertEqual(file.read(), "File Logger: 9\n")
 
 
 # Client code
@@ -114,9 +1067,11 @@ if __name__ == "__main__":
 
     file_logger = logger_factory.create_logger("file")
     file_logger.log("This message will be logged to the file.")
+    file_logger.close()
 
     console_logger = logger_factory.create_logger("console")
     console_logger.log("This message will be logged to the console.")
 
     database_logger = logger_factory.create_logger("database")
     database_logger.log("This message will be logged to the database.")
+    database_logger.close()
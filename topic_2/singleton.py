@@ -1,8 +1,79 @@
+import atexit
 import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+import unittest
+from contextlib import contextmanager
+from unittest import mock
 
 class ConfigurationManager:
+    """
+    Singleton that holds the application configuration.
+
+    Setting changes are applied in memory right away and written behind:
+    the file is rewritten once ``flush_delay`` seconds after the last
+    change, on an explicit ``flush()``, or when the outermost ``batch()``
+    block commits. Writes go to a temporary file that is fsynced and then
+    atomically renamed over 'config.json', so a crash never leaves a
+    partially written file.
+
+    The configuration is published as a snapshot that is replaced, never
+    edited, when it changes, so ``get_setting`` reads it without a lock.
+    With ``start_watching()`` the file is polled for changes and reloaded
+    on a background thread, and subscribers are told which settings changed.
+
+    Settings are resolved from three layers, each overriding the previous
+    one: defaults set with ``set_defaults()``, the config file, and
+    environment variables named ``CONFIG_<section>__<setting>`` (matched
+    case-insensitively). The layers are merged into lookup tables as soon
+    as one of them changes, so a lookup is a plain dict access. Setting a
+    value updates the tables in place for that one setting instead of
+    rebuilding them, so a ``batch()`` of many changes stays cheap and reads
+    inside it see its own changes.
+
+    The instance is created and loaded exactly once per process, even when
+    many threads ask for it at the same time. A forked child keeps the
+    parent's parsed configuration (shared copy-on-write) and reloads it
+    only if the file changed since the parent read it.
+    """
+
     _instance = None
+    _instance_lock = threading.Lock()
     _config_data = None
+    env_prefix = 'CONFIG_'
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+    flush_delay = 0.5
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._dirty = False
+        # time.monotonic() deadline of the pending write-behind, or None
+        self._flush_due = None
+        self._flush_wakeup = threading.Condition(self._lock)
+        self._flusher = None
+        self._batch_depth = 0
+        self._batch_backup = None
+        self._batch_copies = set()
+        self._file_stamp = None
+        self._subscribers = []
+        self._watcher = None
+        self._watch_interval = None
+        self._defaults = {}
+        self._env_layer = self._read_environment()
+        # Merged raw values of the layers, keyed by (section, setting)
+        self._settings = {}
+        # Resolved lookup tables, keyed by value type (None for raw values):
+        # {value_type: {'section.setting': value}} and {value_type: {section: {setting: value}}}
+        self._by_key = {None: {}}
+        self._by_section = {None: {}}
+        # (section, setting) of the environment layer, lowercased
+        self._env_keys = set()
+        self._stop_watching = threading.Event()
+        self.write_count = 0
+        atexit.register(self.flush)
 
     @classmethod
     def get_instance(cls):
@@ -13,10 +84,37 @@ class ConfigurationManager:
             ConfigurationManager: The singleton instance.
         """
         if cls._instance is None:
-            cls._instance = cls()
-            cls._instance.load_config()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = cls()
+                    instance.load_config()
+                    cls._instance = instance
         return cls._instance
 
+    @classmethod
+    def _after_fork_in_child(cls):
+        """Reset locks and threads in a forked child and reload only a changed file."""
+        cls._instance_lock = threading.Lock()
+        instance = cls._instance
+        if instance is None:
+            return
+        watching = instance._watcher is not None
+        instance._lock = threading.RLock()
+        instance._flush_due = None
+        instance._flush_wakeup = threading.Condition(instance._lock)
+        instance._flusher = None
+        instance._watcher = None
+        instance._stop_watching = threading.Event()
+        # Changes pending at fork time belong to the parent, which writes them.
+        instance._dirty = False
+        instance._batch_depth = 0
+        instance._batch_backup = None
+        instance._batch_copies = set()
+        if instance._stat_config() != instance._file_stamp:
+            instance.load_config()
+        if watching:
+            instance.start_watching(instance._watch_interval)
+
     def load_config(self):
         """
         Load the configuration data from the 'config.json' file.
@@ -24,24 +122,196 @@ class ConfigurationManager:
         Returns:
             None
         """
+        self._file_stamp = self._stat_config()
         try:
-            with open('config.json', 'r') as config_file:
+            with open(self.config_path, 'r') as config_file:
                 self._config_data = json.load(config_file)
         except (FileNotFoundError, json.JSONDecodeError):
             self._config_data = {}
+        with self._lock:
+            self._layers_changed()
+
+    def set_defaults(self, defaults):
+        """
+        Set the default settings, used when neither the file nor the environment sets them.
+
+        Args:
+            defaults (dict): The default settings, as {section: {setting_name: value}}.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._defaults = {section: dict(settings) for section, settings in defaults.items()}
+            self._layers_changed()
+
+    def refresh_environment(self):
+        """
+        Re-read the environment variable layer, which is otherwise read once at start-up.
+
+        Returns:
+            bool: True if the environment layer changed.
+        """
+        env_layer = self._read_environment()
+        with self._lock:
+            if env_layer == self._env_layer:
+                return False
+            self._env_layer = env_layer
+            self._layers_changed()
+            return True
+
+    def start_watching(self, interval=1.0):
+        """
+        Reload the configuration whenever the file changes.
+
+        A background thread polls the modification time and size of the file
+        every ``interval`` seconds. A changed file is parsed on that thread
+        and published as a new snapshot; a file that fails to parse is
+        ignored. Changes are not reloaded while local changes are waiting
+        to be written, since the next write would replace them anyway.
+
+        Args:
+            interval (float): The polling interval in seconds.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._stop_watching.clear()
+            self._watch_interval = interval
+            self._watcher = threading.Thread(
+                target=self._watch, args=(interval,), name='ConfigWatcher', daemon=True
+            )
+            self._watcher.start()
+
+    def stop_watching(self):
+        """
+        Stop the thread started by start_watching().
+
+        Returns:
+            None
+        """
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            self._stop_watching.set()
+            watcher.join()
 
-    def get_setting(self, section, setting_name):
+    def subscribe(self, callback, keys=None):
+        """
+        Register a callback for configuration changes made by reloads.
+
+        The callback is called on the watcher thread with a dict that maps
+        each changed (section, setting_name) pair to its new value, or to
+        None if the setting was removed. Only the changed settings are
+        included. A callback that raises is reported on stderr and does not
+        keep the other subscribers from being called.
+
+        Args:
+            callback (callable): The function to notify.
+            keys (iterable): Only notify about these (section, setting_name) pairs. All settings if None.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._subscribers.append((callback, frozenset(keys) if keys is not None else None))
+
+    def unsubscribe(self, callback):
+        """
+        Remove a callback registered with subscribe().
+
+        Args:
+            callback (callable): The function to remove.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._subscribers = [
+                (subscriber, keys) for subscriber, keys in self._subscribers if subscriber != callback
+            ]
+
+    def reload(self):
+        """
+        Reload the file if it changed since it was last read or written.
+
+        Returns:
+            dict: The changed settings, mapping (section, setting_name) to the new value.
+        """
+        previous_stamp = self._file_stamp
+        stamp = self._stat_config()
+        if stamp == previous_stamp:
+            return {}
+        try:
+            with open(self.config_path, 'r') as config_file:
+                new_data = json.load(config_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if not isinstance(new_data, dict):
+            return {}
+
+        with self._lock:
+            if self._dirty or self._batch_depth or self._file_stamp != previous_stamp:
+                # Local changes are pending or were written while the file was read.
+                return {}
+            changes = self._diff(self._config_data, new_data)
+            self._config_data = new_data
+            self._layers_changed()
+            self._file_stamp = stamp
+            subscribers = list(self._subscribers)
+
+        if changes:
+            for callback, keys in subscribers:
+                selected = changes if keys is None else {
+                    key: value for key, value in changes.items() if key in keys
+                }
+                if selected:
+                    try:
+                        callback(selected)
+                    except Exception:
+                        traceback.print_exc()
+        return changes
+
+    def get_setting(self, section, setting_name, value_type=None):
         """
         Get the value of a setting in a specific section.
 
         Args:
             section (str): The section name.
             setting_name (str): The setting name.
+            value_type (type): Convert the value to this type, e.g. int, float, bool or dict.
+
+        Returns:
+            any: The value of the setting, or None if not found.
+        """
+        try:
+            return self._by_section[value_type][section][setting_name]
+        except KeyError:
+            return self._lookup_missing(section, setting_name, value_type)
+
+    def get(self, key, value_type=None):
+        """
+        Get the value of a setting by its dotted 'section.setting_name' key.
+
+        This is the fastest lookup: a single access to the resolved table.
+        The key is split at its first dot, so settings of a section whose
+        name contains a dot are only found by get_setting().
+
+        Args:
+            key (str): The dotted key of the setting.
+            value_type (type): Convert the value to this type, e.g. int, float, bool or dict.
 
         Returns:
             any: The value of the setting, or None if not found.
         """
-        return self._config_data.get(section, {}).get(setting_name)
+        try:
+            return self._by_key[value_type][key]
+        except KeyError:
+            section, _, setting_name = key.partition('.')
+            return self._lookup_missing(section, setting_name, value_type)
 
     def set_setting(self, section, setting_name, value):
         """
@@ -55,11 +325,484 @@ class ConfigurationManager:
         Returns:
             None
         """
-        if section not in self._config_data:
-            self._config_data[section] = {}
-        self._config_data[section][setting_name] = value
-        with open('config.json', 'w') as config_file:
-            json.dump(self._config_data, config_file, indent=4)
+        with self._lock:
+            if self._batch_depth and section in self._batch_copies:
+                # The section was already copied by this batch, so it is not
+                # part of any snapshot older than the batch.
+                self._config_data[section][setting_name] = value
+            else:
+                config_data = dict(self._config_data)
+                config_data[section] = dict(config_data.get(section, {}))
+                config_data[section][setting_name] = value
+                self._config_data = config_data
+                if self._batch_depth:
+                    self._batch_copies.add(section)
+            self._dirty = True
+            self._setting_changed(section, setting_name, value)
+            if self._batch_depth == 0:
+                self._schedule_flush()
+
+    @contextmanager
+    def batch(self):
+        """
+        Group setting changes into one transaction that is written once.
+
+        The changes made inside the block are written to the file in a single
+        write when the outermost block exits. If the block raises, the
+        changes are rolled back and nothing is written.
+
+        The lock of the instance is held for the whole block, so changes
+        from other threads wait for the batch to end instead of joining it
+        and being rolled back with it. Reads do not take the lock.
+
+        Yields:
+            ConfigurationManager: The instance itself.
+        """
+        with self._lock:
+            if self._batch_depth == 0:
+                self._batch_backup = (self._config_data, self._dirty)
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._config_data, self._dirty = self._batch_backup
+                    self._batch_backup = None
+                    self._batch_copies.clear()
+                    self._layers_changed()
+                raise
+            else:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._batch_backup = None
+                    self._batch_copies.clear()
+                    self.flush()
+
+    def flush(self):
+        """
+        Write pending setting changes to the file now.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._flush_due = None
+            if not self._dirty or self._batch_depth:
+                return
+            self._write_atomic(json.dumps(self._config_data, indent=4))
+            self._file_stamp = self._stat_config()
+            self._dirty = False
+            self.write_count += 1
+
+    def _layers_changed(self):
+        """Rebuild the lookup tables after a layer was replaced. Called with the lock held."""
+        self._rebuild()
+
+    def _setting_changed(self, section, setting_name, value):
+        """Update the lookup tables in place for one setting of the file layer. Called with the lock held."""
+        if (section.lower(), setting_name.lower()) in self._env_keys:
+            # The environment overrides the setting, possibly under another case.
+            self._rebuild()
+            return
+        self._settings[(section, setting_name)] = value
+        self._by_section[None].setdefault(section, {})[setting_name] = value
+        dotted_key = f'{section}.{setting_name}'
+        if '.' not in section:
+            self._by_key[None][dotted_key] = value
+        for value_type, table in self._by_section.items():
+            if value_type is not None:
+                table.get(section, {}).pop(setting_name, None)
+        for value_type, table in self._by_key.items():
+            if value_type is not None:
+                table.pop(dotted_key, None)
+
+    def _rebuild(self):
+        """Merge the layers into new lookup tables and publish them."""
+        with self._lock:
+            merged = {}
+            for layer in (self._defaults, self._config_data or {}):
+                for section, settings in layer.items():
+                    if isinstance(settings, dict):
+                        for setting_name, value in settings.items():
+                            merged[(section, setting_name)] = value
+            known_keys = {(section.lower(), setting_name.lower()): (section, setting_name)
+                          for section, setting_name in merged}
+            env_keys = set()
+            for env_key, value in self._env_layer.items():
+                section, _, setting_name = env_key.partition('__')
+                key = (section.lower(), setting_name.lower())
+                merged[known_keys.get(key, (section, setting_name))] = value
+                env_keys.add(key)
+            nested = {}
+            dotted = {}
+            for (section, setting_name), value in merged.items():
+                nested.setdefault(section, {})[setting_name] = value
+                if '.' not in section:
+                    dotted[f'{section}.{setting_name}'] = value
+            self._settings = merged
+            self._env_keys = env_keys
+            self._by_key = {None: dotted}
+            self._by_section = {None: nested}
+
+    def _lookup_missing(self, section, setting_name, value_type):
+        """
+        Get a setting that is not in the lookup tables yet: a missing setting,
+        or one not yet converted to the type. The result is added to the
+        tables, which are replaced as a whole when the layers change.
+        """
+        with self._lock:
+            # Tables of the same build, so a value is never cached into a newer one.
+            settings, by_key, by_section = self._settings, self._by_key, self._by_section
+        value = settings.get((section, setting_name))
+        if value is not None and value_type is not None and not isinstance(value, value_type):
+            if value_type is bool and isinstance(value, str):
+                value = value.strip().lower() in ('1', 'true', 'yes', 'on')
+            elif value_type in (dict, list) and isinstance(value, str):
+                value = json.loads(value)
+            else:
+                value = value_type(value)
+        by_section.setdefault(value_type, {}).setdefault(section, {})[setting_name] = value
+        if '.' not in section:
+            by_key.setdefault(value_type, {})[f'{section}.{setting_name}'] = value
+        return value
+
+    def _read_environment(self):
+        """Read the environment variables of the environment layer, without their prefix."""
+        prefix = self.env_prefix
+        return {
+            name[len(prefix):]: value
+            for name, value in os.environ.items()
+            if name.startswith(prefix) and '__' in name[len(prefix):]
+        }
+
+    def _watch(self, interval):
+        """Watcher thread loop: poll the file and reload it when it changes."""
+        while not self._stop_watching.wait(interval):
+            try:
+                self.reload()
+            except Exception:
+                traceback.print_exc()
+
+    def _stat_config(self):
+        """Get the (mtime_ns, size) stamp of the config file, or None if it is missing."""
+        try:
+            stat = os.stat(self.config_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _diff(old_data, new_data):
+        """Get the settings that differ between two configurations."""
+        changes = {}
+        for section in old_data.keys() | new_data.keys():
+            old_section = old_data.get(section)
+            new_section = new_data.get(section)
+            if not isinstance(old_section, dict):
+                old_section = {}
+            if not isinstance(new_section, dict):
+                new_section = {}
+            for setting_name in old_section.keys() | new_section.keys():
+                if setting_name not in new_section:
+                    changes[(section, setting_name)] = None
+                elif setting_name not in old_section or old_section[setting_name] != new_section[setting_name]:
+                    changes[(section, setting_name)] = new_section[setting_name]
+        return changes
+
+    def _schedule_flush(self):
+        """Move the write-behind deadline to flush_delay from now. Called with the lock held."""
+        pending = self._flush_due is not None
+        self._flush_due = time.monotonic() + self.flush_delay
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='ConfigFlusher', daemon=True)
+            self._flusher.start()
+        elif not pending:
+            self._flush_wakeup.notify()
+
+    def _flush_loop(self):
+        """Flusher thread loop: write pending changes once their deadline passes."""
+        with self._lock:
+            while True:
+                if self._flush_due is None:
+                    self._flush_wakeup.wait()
+                    continue
+                remaining = self._flush_due - time.monotonic()
+                if remaining > 0:
+                    # A later change may have moved the deadline; check it again on waking.
+                    self._flush_wakeup.wait(remaining)
+                    continue
+                try:
+                    self.flush()
+                except Exception:
+                    self._flush_due = None
+                    traceback.print_exc()
+
+    def _write_atomic(self, text):
+        """Write the text to a temporary file, fsync it and rename it over the config file."""
+        directory = os.path.dirname(os.path.abspath(self.config_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.config-', suffix='.tmp')
+        try:
+            if os.path.exists(self.config_path):
+                os.chmod(temp_path, os.stat(self.config_path).st_mode & 0o777)
+            with os.fdopen(fd, 'w') as temp_file:
+                temp_file.write(text)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, self.config_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=ConfigurationManager._after_fork_in_child)
+
+
+class TestConfigurationManagerInitialization(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.temp_dir.name, 'config.json')
+        with open(self.config_path, 'w') as config_file:
+            json.dump({'AppConfig': {'setting1': 'value1'}}, config_file)
+        patcher = mock.patch.multiple(
+            ConfigurationManager, config_path=self.config_path, _instance=None
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+        # Write pending changes before the next test points config_path elsewhere.
+        self.addCleanup(self._flush_instance)
+
+    def _flush_instance(self):
+        if ConfigurationManager._instance is not None:
+            ConfigurationManager._instance.flush()
+
+    def test_concurrent_get_instance_loads_once(self):
+        """256 threads calling get_instance at once must share one instance loaded once."""
+        threads_count = 256
+        barrier = threading.Barrier(threads_count)
+        instances = []
+
+        def worker():
+            barrier.wait()
+            instances.append(ConfigurationManager.get_instance())
+
+        with mock.patch.object(
+            ConfigurationManager,
+            'load_config',
+            autospec=True,
+            side_effect=ConfigurationManager.load_config,
+        ) as load_config:
+            threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(load_config.call_count, 1)
+        self.assertEqual(len(instances), threads_count)
+        self.assertTrue(all(instance is instances[0] for instance in instances))
+        self.assertEqual(instances[0].get_setting('AppConfig', 'setting1'), 'value1')
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_forked_child_reloads_only_changed_file(self):
+        parent_data = ConfigurationManager.get_instance()._config_data
+
+        def run_in_child():
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                with os.fdopen(write_fd, 'w') as pipe:
+                    instance = ConfigurationManager.get_instance()
+                    pipe.write(json.dumps([
+                        instance.get_setting('AppConfig', 'setting1'),
+                        instance._config_data is parent_data,
+                    ]))
+                os._exit(0)
+            os.close(write_fd)
+            with os.fdopen(read_fd) as pipe:
+                result = json.loads(pipe.read())
+            os.waitpid(pid, 0)
+            return result
+
+        self.assertEqual(run_in_child(), ['value1', True])
+
+        with open(self.config_path, 'w') as config_file:
+            json.dump({'AppConfig': {'setting1': 'changed value'}}, config_file)
+        self.assertEqual(run_in_child(), ['changed value', False])
+        self.assertIs(ConfigurationManager.get_instance()._config_data, parent_data)
+
+    def test_write_behind_coalesces_updates(self):
+        instance = ConfigurationManager.get_instance()
+        instance.flush_delay = 0.2
+        for i in range(10000):
+            instance.set_setting('AppConfig', 'counter', i)
+        self.assertEqual(instance.write_count, 0)
+        for _ in range(500):
+            if instance.write_count:
+                break
+            threading.Event().wait(0.01)
+        threading.Event().wait(0.3)
+        self.assertEqual(instance.write_count, 1)
+        with open(self.config_path) as config_file:
+            self.assertEqual(json.load(config_file)['AppConfig']['counter'], 9999)
+        self.assertTrue(instance._flusher.is_alive())
+
+    def test_batch_rolls_back_on_exception(self):
+        instance = ConfigurationManager.get_instance()
+        with self.assertRaises(RuntimeError):
+            with instance.batch():
+                instance.set_setting('AppConfig', 'setting1', 'changed')
+                instance.set_setting('Other', 'setting2', 'added')
+                self.assertEqual(instance.get_setting('AppConfig', 'setting1'), 'changed')
+                self.assertEqual(instance.get('Other.setting2'), 'added')
+                raise RuntimeError('abort')
+        self.assertEqual(instance.get_setting('AppConfig', 'setting1'), 'value1')
+        self.assertIsNone(instance.get_setting('Other', 'setting2'))
+        instance.flush()
+        self.assertEqual(instance.write_count, 0)
+        with open(self.config_path) as config_file:
+            self.assertEqual(json.load(config_file), {'AppConfig': {'setting1': 'value1'}})
+
+        with instance.batch():
+            instance.set_setting('AppConfig', 'setting1', 'committed')
+        self.assertEqual(instance.write_count, 1)
+
+    def test_layer_precedence(self):
+        instance = ConfigurationManager.get_instance()
+        instance.set_defaults({
+            'AppConfig': {'setting1': 'default', 'port': 80, 'debug': False},
+            'Extra': {'only_default': 1},
+        })
+        self.assertEqual(instance.get_setting('AppConfig', 'setting1'), 'value1')
+        self.assertEqual(instance.get('AppConfig.port'), 80)
+        self.assertEqual(instance.get_setting('Extra', 'only_default'), 1)
+
+        with mock.patch.dict(os.environ, {
+            'CONFIG_appconfig__PORT': '8080',
+            'CONFIG_APPCONFIG__setting1': 'environment',
+            'CONFIG_AppConfig__debug': 'yes',
+            'CONFIG_NoDoubleUnderscore': 'ignored',
+        }):
+            self.assertTrue(instance.refresh_environment())
+        self.assertEqual(instance.get_setting('AppConfig', 'setting1'), 'environment')
+        self.assertEqual(instance.get_setting('AppConfig', 'port'), '8080')
+        self.assertEqual(instance.get_setting('AppConfig', 'port', int), 8080)
+        self.assertEqual(instance.get('AppConfig.port', int), 8080)
+        self.assertIs(instance.get('AppConfig.debug', bool), True)
+        self.assertIsNone(instance.get_setting('appconfig', 'PORT'))
+        self.assertIsNone(instance.get('NoDoubleUnderscore.'))
+
+        # A file change is shadowed by the environment but not by the defaults.
+        instance.set_setting('AppConfig', 'setting1', 'file')
+        instance.set_setting('Extra', 'only_default', 2)
+        self.assertEqual(instance.get_setting('AppConfig', 'setting1'), 'environment')
+        self.assertEqual(instance.get_setting('Extra', 'only_default'), 2)
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertTrue(instance.refresh_environment())
+        self.assertEqual(instance.get_setting('AppConfig', 'setting1'), 'file')
+        self.assertEqual(instance.get_setting('AppConfig', 'port', int), 80)
+
+    def test_batch_rollback_keeps_other_threads_changes(self):
+        instance = ConfigurationManager.get_instance()
+        other_started = threading.Event()
+
+        def other_thread():
+            other_started.set()
+            instance.set_setting('Other', 'setting2', 'from other thread')
+
+        other = threading.Thread(target=other_thread)
+        with self.assertRaises(RuntimeError):
+            with instance.batch():
+                instance.set_setting('AppConfig', 'setting1', 'rolled back')
+                other.start()
+                other_started.wait()
+                # Give the other thread time to try to join the batch.
+                other.join(0.1)
+                self.assertTrue(other.is_alive())
+                raise RuntimeError('abort')
+        other.join()
+        self.assertEqual(instance.get_setting('AppConfig', 'setting1'), 'value1')
+        self.assertEqual(instance.get_setting('Other', 'setting2'), 'from other thread')
+        self.assertTrue(instance._dirty)
+        instance.flush()
+        with open(self.config_path) as config_file:
+            self.assertEqual(json.load(config_file)['Other'], {'setting2': 'from other thread'})
+
+    def test_batch_reads_its_own_typed_writes(self):
+        instance = ConfigurationManager.get_instance()
+        instance.set_setting('AppConfig', 'port', '80')
+        self.assertEqual(instance.get('AppConfig.port', int), 80)
+        with mock.patch.dict(os.environ, {'CONFIG_appconfig__HOST': 'env-host'}):
+            instance.refresh_environment()
+            with instance.batch():
+                instance.set_setting('AppConfig', 'port', '8080')
+                instance.set_setting('AppConfig', 'host', 'file-host')
+                self.assertEqual(instance.get('AppConfig.port', int), 8080)
+                self.assertEqual(instance.get_setting('AppConfig', 'port', int), 8080)
+                self.assertEqual(instance.get('AppConfig.host'), 'env-host')
+        instance.refresh_environment()
+        self.assertEqual(instance.get('AppConfig.host'), 'file-host')
+
+    def test_dotted_sections_do_not_collide(self):
+        instance = ConfigurationManager.get_instance()
+        instance.set_defaults({'a': {'b.c': 'from a'}, 'a.b': {'c': 'from a.b'}})
+        self.assertEqual(instance.get_setting('a.b', 'c'), 'from a.b')
+        self.assertEqual(instance.get_setting('a', 'b.c'), 'from a')
+        self.assertEqual(instance.get('a.b.c'), 'from a')
+        self.assertIn('a.b', instance._by_section[None])
+        self.assertEqual(instance.get_setting('a.b', 'c', str), 'from a.b')
+        self.assertEqual(instance.get_setting('a', 'b.c', str), 'from a')
+
+    def test_watcher_survives_scalar_sections_and_failing_callbacks(self):
+        instance = ConfigurationManager.get_instance()
+        changes = []
+
+        def failing_callback(changed):
+            changes.append(changed)
+            raise ValueError('subscriber failed')
+
+        instance.subscribe(failing_callback)
+        instance.start_watching(interval=0.01)
+        self.addCleanup(instance.stop_watching)
+
+        with open(self.config_path, 'w') as config_file:
+            json.dump({'version': 2, 'AppConfig': {'setting1': 'value2'}}, config_file)
+        with mock.patch('traceback.print_exc'):
+            for _ in range(500):
+                if changes:
+                    break
+                threading.Event().wait(0.01)
+            self.assertEqual(changes, [{('AppConfig', 'setting1'): 'value2'}])
+            self.assertTrue(instance._watcher.is_alive())
+
+            with open(self.config_path, 'w') as config_file:
+                json.dump({'version': 3, 'AppConfig': {'setting1': 'value3'}}, config_file)
+            for _ in range(500):
+                if instance.get_setting('AppConfig', 'setting1') == 'value3':
+                    break
+                threading.Event().wait(0.01)
+        self.assertEqual(instance.get_setting('AppConfig', 'setting1'), 'value3')
+        self.assertTrue(instance._watcher.is_alive())
+
+    def test_failing_subscriber_does_not_stop_the_others(self):
+        instance = ConfigurationManager.get_instance()
+        received = []
+
+        def failing_callback(changed):
+            raise ValueError('subscriber failed')
+
+        instance.subscribe(failing_callback)
+        instance.subscribe(received.append)
+        with open(self.config_path, 'w') as config_file:
+            json.dump({'AppConfig': {'setting1': 'value2', 'setting2': 'new'}}, config_file)
+        with mock.patch('traceback.print_exc') as print_exc:
+            changes = instance.reload()
+        self.assertEqual(changes, {('AppConfig', 'setting1'): 'value2', ('AppConfig', 'setting2'): 'new'})
+        self.assertEqual(received, [changes])
+        print_exc.assert_called_once()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,483 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import unittest
+import unittest.mock
+from datetime import datetime
+
+from factory_pattern import BufferedLogger
+
+# Record layout: a 4-byte body length followed by the body. The body starts
+# with a fixed header (timestamp, level code, logger id, field count) so
+# queries can filter on those without decoding the fields.
+RECORD_LENGTH = struct.Struct("<I")
+RECORD_HEADER = struct.Struct("<dBHH")
+FIELD_HEADER = struct.Struct("<HI")
+# Sparse index entry: block start offset, block end offset, min and max timestamp.
+INDEX_ENTRY = struct.Struct("<QQdd")
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LEVEL_CODES = {level: code for code, level in enumerate(LEVELS)}
+
+
+# StructuredLogger class
+class StructuredLogger(BufferedLogger):
+    """
+    Represents a logger that writes binary structured records into segment files.
+
+    Each segment ``<prefix>-<n>.seg`` holds length-prefixed records and has
+    two sidecar files: ``.idx``, a sparse index with the offset range and
+    time range of every block of ``index_interval`` records, and ``.dict``,
+    the segment's dictionary of logger names and field keys, one per line,
+    whose line number is the id used in the records.
+    """
+
+    def __init__(
+        self,
+        directory: str = "structured_logs",
+        logger_name: str = "app",
+        prefix: str = "log",
+        segment_bytes: int = 64 * 1024 * 1024,
+        index_interval: int = 256,
+        batch_size: int = 512,
+        flush_interval: float = 0.5,
+    ) -> None:
+        """
+        Open a new segment in the directory and start the background writer thread.
+
+        Args:
+            directory (str): The directory holding the segment files.
+            logger_name (str): The logger name stored with every record.
+            prefix (str): The file name prefix of the segments.
+            segment_bytes (int): Start a new segment once the current one reaches this size.
+            index_interval (int): The number of records per sparse index entry.
+            batch_size (int): The number of records written per batch.
+            flush_interval (float): The maximum time in seconds a record waits before being written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.logger_name = logger_name
+        self.prefix = prefix
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval
+        existing = segment_paths(directory, prefix)
+        self._segment_number = _segment_number(existing[-1]) + 1 if existing else 0
+        self._open_segment()
+        super().__init__(batch_size, flush_interval)
+
+    def log(self, message: str, level: str = "INFO", **fields) -> None:
+        """
+        Queue a structured record to be written.
+
+        Args:
+            message (str): The message to be logged, stored as the "message" field.
+            level (str): The severity level, one of LEVELS.
+            **fields: Extra fields of the record. Values are stored as strings.
+
+        Returns:
+            None
+        """
+        if level not in LEVEL_CODES:
+            raise ValueError(f"Invalid level: {level}")
+        fields["message"] = message
+        self._enqueue((time.time(), LEVEL_CODES[level], self.logger_name, fields))
+
+    def _open_segment(self) -> None:
+        """Open the files of the next segment and reset its dictionary and index block."""
+        base = os.path.join(
+            self.directory, f"{self.prefix}-{self._segment_number:06d}"
+        )
+        self._data = open(base + ".seg", "ab")
+        self._index = open(base + ".idx", "ab")
+        self._dictionary_file = open(base + ".dict", "a", encoding="utf-8")
+        self._dictionary = {}
+        self._offset = 0
+        self._block_start = 0
+        self._block_count = 0
+        self._block_min = float("inf")
+        self._block_max = float("-inf")
+
+    def _close_segment(self) -> None:
+        """Index the last partial block and close the files of the current segment."""
+        self._end_block()
+        self._data.close()
+        self._index.close()
+        self._dictionary_file.close()
+
+    def _term_id(self, term: str, new_terms: dict) -> int:
+        """Get the dictionary id of a logger name or field key, adding it to new_terms if new."""
+        term_id = self._dictionary.get(term)
+        if term_id is None:
+            term_id = new_terms.get(term)
+            if term_id is None:
+                term_id = new_terms[term] = len(self._dictionary) + len(new_terms)
+        return term_id
+
+    def _encode(self, record: tuple, new_terms: dict) -> bytes:
+        """Encode a queued record into its length-prefixed binary form."""
+        timestamp, level_code, logger_name, fields = record
+        parts = [
+            RECORD_HEADER.pack(
+                timestamp, level_code, self._term_id(logger_name, new_terms), len(fields)
+            )
+        ]
+        for key, value in fields.items():
+            value_bytes = str(value).encode("utf-8")
+            parts.append(FIELD_HEADER.pack(self._term_id(key, new_terms), len(value_bytes)))
+            parts.append(value_bytes)
+        body = b"".join(parts)
+        return RECORD_LENGTH.pack(len(body)) + body
+
+    def _end_block(self) -> None:
+        """Append the index entry of the current block, if it has records."""
+        if self._block_count:
+            self._index.write(
+                INDEX_ENTRY.pack(
+                    self._block_start, self._offset, self._block_min, self._block_max
+                )
+            )
+        self._block_start = self._offset
+        self._block_count = 0
+        self._block_min = float("inf")
+        self._block_max = float("-inf")
+
+    def _write_batch(self, batch: list) -> None:
+        """
+        Encode the batch, write it to the current segment and update the index.
+
+        The whole batch is encoded against local copies of the block and
+        dictionary state first, so a record that fails to encode leaves the
+        segment, its index and its dictionary untouched.
+        """
+        new_terms = {}
+        chunks = []
+        index_entries = []
+        offset = self._offset
+        block_start = self._block_start
+        block_count = self._block_count
+        block_min = self._block_min
+        block_max = self._block_max
+        for record in batch:
+            encoded = self._encode(record, new_terms)
+            chunks.append(encoded)
+            offset += len(encoded)
+            block_count += 1
+            block_min = min(block_min, record[0])
+            block_max = max(block_max, record[0])
+            if block_count >= self.index_interval:
+                index_entries.append(INDEX_ENTRY.pack(block_start, offset, block_min, block_max))
+                block_start = offset
+                block_count = 0
+                block_min = float("inf")
+                block_max = float("-inf")
+
+        # The dictionary must reach the disk before records that refer to it.
+        if new_terms:
+            self._dictionary_file.write("".join(json.dumps(term) + "\n" for term in new_terms))
+            self._dictionary_file.flush()
+            self._dictionary.update(new_terms)
+        try:
+            self._data.write(b"".join(chunks))
+            self._data.flush()
+        except BaseException:
+            # Drop a partly written batch so later records keep their indexed offsets.
+            self._data.truncate(self._offset)
+            raise
+        self._index.write(b"".join(index_entries))
+        self._index.flush()
+        self._offset = offset
+        self._block_start = block_start
+        self._block_count = block_count
+        self._block_min = block_min
+        self._block_max = block_max
+        if self._offset >= self.segment_bytes:
+            self._close_segment()
+            self._segment_number += 1
+            self._open_segment()
+
+    def _close_sink(self) -> None:
+        """Close the current segment."""
+        self._close_segment()
+
+
+def _segment_number(path: str) -> int:
+    """Get the sequence number from a segment path."""
+    return int(os.path.basename(path)[: -len(".seg")].rsplit("-", 1)[1])
+
+
+def segment_paths(directory: str, prefix: str = "log") -> list:
+    """
+    Get the segment files of a log directory, oldest first.
+
+    Args:
+        directory (str): The directory holding the segment files.
+        prefix (str): The file name prefix of the segments.
+
+    Returns:
+        list: The paths of the .seg files.
+    """
+    paths = glob.glob(os.path.join(glob.escape(directory), f"{prefix}-*.seg"))
+    return sorted(paths, key=_segment_number)
+
+
+def _read_blocks(segment: str) -> list:
+    """Read the sparse index of a segment, adding an entry for the unindexed tail."""
+    base = segment[: -len(".seg")]
+    try:
+        with open(base + ".idx", "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        data = b""
+    usable = len(data) - len(data) % INDEX_ENTRY.size
+    blocks = list(INDEX_ENTRY.iter_unpack(data[:usable]))
+    indexed_end = blocks[-1][1] if blocks else 0
+    size = os.path.getsize(segment)
+    if size > indexed_end:
+        blocks.append((indexed_end, size, float("-inf"), float("inf")))
+    return blocks
+
+
+def _read_dictionary(segment: str) -> list:
+    """Read the dictionary of a segment as a list indexed by term id."""
+    with open(segment[: -len(".seg")] + ".dict", encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def query(
+    directory: str,
+    start: float = None,
+    end: float = None,
+    level: str = None,
+    logger_name: str = None,
+    fields: dict = None,
+    prefix: str = "log",
+):
+    """
+    Yield the records of a log directory that match every given filter.
+
+    The sparse index is used to seek straight to the blocks overlapping the
+    time range. Timestamp, level and logger are compared from the fixed
+    record header, and field filters are pre-checked on the raw bytes, so
+    only records that can match are decoded.
+
+    Args:
+        directory (str): The directory holding the segment files.
+        start (float): The earliest timestamp to include, or None for no lower bound.
+        end (float): The timestamp to stop before, or None for no upper bound.
+        level (str): Only include records at this level or above.
+        logger_name (str): Only include records from this logger.
+        fields (dict): Only include records whose fields have these string values.
+        prefix (str): The file name prefix of the segments.
+
+    Yields:
+        dict: The timestamp, level, logger and fields of each matching record.
+    """
+    start = float("-inf") if start is None else start
+    end = float("inf") if end is None else end
+    min_level = LEVEL_CODES[level] if level is not None else 0
+    fields = {key: str(value) for key, value in (fields or {}).items()}
+
+    for segment in segment_paths(directory, prefix):
+        blocks = [
+            block
+            for block in _read_blocks(segment)
+            if block[3] >= start and block[2] < end
+        ]
+        if not blocks:
+            continue
+        dictionary = _read_dictionary(segment)
+        term_ids = {term: term_id for term_id, term in enumerate(dictionary)}
+        logger_id = None
+        if logger_name is not None:
+            logger_id = term_ids.get(logger_name)
+            if logger_id is None:
+                continue
+        needles = []
+        for key, value in fields.items():
+            if key in term_ids:
+                value_bytes = value.encode("utf-8")
+                needles.append(
+                    FIELD_HEADER.pack(term_ids[key], len(value_bytes)) + value_bytes
+                )
+        if len(needles) < len(fields):
+            # A filtered field never occurs in this segment.
+            continue
+        with open(segment, "rb") as file:
+            for block_start, block_end, _, _ in blocks:
+                file.seek(block_start)
+                yield from _scan_block(
+                    file.read(block_end - block_start),
+                    dictionary,
+                    start,
+                    end,
+                    min_level,
+                    logger_id,
+                    fields,
+                    needles,
+                )
+
+
+def _scan_block(data, dictionary, start, end, min_level, logger_id, fields, needles):
+    """Yield the decoded records of a block that pass the filters."""
+    position = 0
+    while position + RECORD_LENGTH.size <= len(data):
+        (length,) = RECORD_LENGTH.unpack_from(data, position)
+        body_start = position + RECORD_LENGTH.size
+        position = body_start + length
+        if position > len(data):
+            # A record still being written by the logger.
+            return
+        timestamp, level_code, record_logger, field_count = RECORD_HEADER.unpack_from(
+            data, body_start
+        )
+        if not start <= timestamp < end or level_code < min_level:
+            continue
+        if logger_id is not None and record_logger != logger_id:
+            continue
+        body = data[body_start:position]
+        if any(needle not in body for needle in needles):
+            continue
+        record = _decode_fields(body, field_count, dictionary)
+        if any(record.get(key) != value for key, value in fields.items()):
+            continue
+        yield {
+            "timestamp": timestamp,
+            "level": LEVELS[level_code],
+            "logger": dictionary[record_logger],
+            "fields": record,
+        }
+
+
+def _decode_fields(body: bytes, field_count: int, dictionary: list) -> dict:
+    """Decode the fields of a record body."""
+    fields = {}
+    position = RECORD_HEADER.size
+    for _ in range(field_count):
+        key_id, value_length = FIELD_HEADER.unpack_from(body, position)
+        position += FIELD_HEADER.size
+        fields[dictionary[key_id]] = body[position : position + value_length].decode(
+            "utf-8"
+        )
+        position += value_length
+    return fields
+
+
+def _parse_time(value: str) -> float:
+    """Parse a command line time given as epoch seconds or an ISO 8601 string."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv: list = None) -> None:
+    """ Query CLI: print the matching records of a log directory as JSON lines """
+    parser = argparse.ArgumentParser(description="Query structured log segments.")
+    parser.add_argument("directory", help="directory holding the segment files")
+    parser.add_argument("--start", type=_parse_time, help="epoch seconds or ISO time")
+    parser.add_argument("--end", type=_parse_time, help="epoch seconds or ISO time")
+    parser.add_argument("--level", choices=LEVELS, help="minimum level")
+    parser.add_argument("--logger", help="logger name")
+    parser.add_argument(
+        "--field",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="field filter, may be repeated",
+    )
+    parser.add_argument("--prefix", default="log", help="segment file name prefix")
+    args = parser.parse_args(argv)
+
+    fields = dict(field.split("=", 1) for field in args.field)
+    for record in query(
+        args.directory,
+        start=args.start,
+        end=args.end,
+        level=args.level,
+        logger_name=args.logger,
+        fields=fields,
+        prefix=args.prefix,
+    ):
+        sys.stdout.write(json.dumps(record) + "\n")
+
+
+class TestStructuredLog(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+        for name in ("api", "worker"):
+            logger = StructuredLogger(
+                self.directory, logger_name=name, segment_bytes=512, index_interval=3, batch_size=4
+            )
+            for i in range(20):
+                level = LEVELS[i % len(LEVELS)]
+                logger.log(f"{name} {i}", level=level, user=f"u{i % 3}", attempt=i)
+            logger.close()
+
+    def test_round_trip_through_segments_and_index(self):
+        records = list(query(self.directory))
+        self.assertEqual(len(records), 40)
+        self.assertGreater(len(segment_paths(self.directory)), 2)
+        self.assertEqual(
+            records[7],
+            {
+                "timestamp": records[7]["timestamp"],
+                "level": "WARNING",
+                "logger": "api",
+                "fields": {"user": "u1", "attempt": "7", "message": "api 7"},
+            },
+        )
+        self.assertEqual(
+            [record["timestamp"] for record in records],
+            sorted(record["timestamp"] for record in records),
+        )
+
+        worker = list(query(self.directory, logger_name="worker", level="ERROR", fields={"user": "u0"}))
+        self.assertEqual(
+            [record["fields"]["message"] for record in worker],
+            [f"worker {i}" for i in range(20) if i % 5 >= 3 and i % 3 == 0],
+        )
+        middle = records[10]["timestamp"]
+        self.assertEqual(
+            list(query(self.directory, start=middle)),
+            [record for record in records if record["timestamp"] >= middle],
+        )
+        self.assertEqual(list(query(self.directory, fields={"missing": "x"})), [])
+
+    def test_failed_batch_leaves_the_segment_intact(self):
+        directory = os.path.join(self.directory, "failed")
+        logger = StructuredLogger(directory, index_interval=2, batch_size=2, flush_interval=60)
+        with unittest.mock.patch("traceback.print_exc"):
+            logger.log("ok0", new_key="a")
+            logger.flush()
+            # A lone surrogate cannot be encoded, so this whole batch fails.
+            logger.log("dropped", third_key="b")
+            logger.log("bad", other_key="\ud800")
+            logger.flush()
+        for i in range(1, 4):
+            logger.log(f"ok{i}", new_key=str(i), fourth_key="c")
+        logger.close()
+        self.assertEqual(logger.failed, 2)
+        records = list(query(directory))
+        self.assertEqual([record["fields"]["message"] for record in records], ["ok0", "ok1", "ok2", "ok3"])
+        self.assertEqual(records[2]["fields"], {"new_key": "2", "fourth_key": "c", "message": "ok2"})
+        self.assertEqual(_read_dictionary(segment_paths(directory)[0]), ["app", "new_key", "message", "fourth_key"])
+
+    def test_main_prints_matching_records(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main([self.directory, "--level", "CRITICAL", "--logger", "api", "--field", "user=u1"])
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([record["fields"]["message"] for record in records], ["api 4", "api 19"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,633 @@
+import hashlib
 import json
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import unittest
+from collections import Counter, OrderedDict
+from unittest import mock
+
+# Files whose path ends with this suffix use append-only JSON Lines storage:
+# one record per line, with updates and deletions appended as tombstones.
+# Any other path uses a single JSON array.
+JSONL_SUFFIX = ".jsonl"
+TOMBSTONE_KEY = "_tombstone"
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+# Sidecar index of a JSON Lines file: a header followed by an open-addressing
+# hash table of (key hash, record offset + 1) slots. Offset 0 marks an empty
+# slot and DELETED_SLOT a record that was superseded or deleted.
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"STUIDX01"
+INDEX_HEADER = struct.Struct("<8sQQQQ")
+INDEX_SLOT = struct.Struct("<QQ")
+DELETED_SLOT = 2**64 - 1
+MAX_LOAD_FACTOR = 0.7
+INDEXED_KEYS = ("student_id", "name")
+
+_indexes = {}
+
+# Trigram indexes for fuzzy name search, kept in memory per file.
+TRIGRAM_SIZE = 3
+_trigram_indexes = {}
+
+# Parsed records are cached per file up to about this many bytes of memory.
+RECORD_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Estimated memory used per cached record by the cache's own dicts, and per
+# record by each lookup dict built over a cached file.
+CACHED_RECORD_OVERHEAD = 200
+CACHED_LOOKUP_OVERHEAD = 128
+# Parsed records take at least this many times the bytes of their source, so
+# a larger file is not parsed just to find it does not fit.
+MIN_PARSED_BYTES_PER_SOURCE_BYTE = 4
+# How many files searched once are remembered, to cache them when searched again.
+RECORD_CACHE_SEEN_FILES = 1024
+
+
+def _is_jsonl(file_path: str) -> bool:
+    """Check whether the file uses append-only JSON Lines storage."""
+    return file_path.endswith(JSONL_SUFFIX)
+
+
+def _file_lock(file_path: str) -> threading.Lock:
+    """Get the lock that serializes appends with the final step of a compaction."""
+    key = os.path.abspath(file_path)
+    with _file_locks_guard:
+        return _file_locks.setdefault(key, threading.Lock())
+
+
+def _append_lines(file_path: str, entries: list) -> None:
+    """Append entries to a JSON Lines file with a single write and index them."""
+    with _file_lock(file_path):
+        _append_lines_locked(file_path, entries)
+
+
+def _append_lines_locked(file_path: str, entries: list) -> None:
+    """Append entries to a JSON Lines file and index them. Call with the file lock held."""
+    lines = [(json.dumps(entry) + "\n").encode() for entry in entries]
+    # Open (or rebuild) the index before appending, so it covers exactly
+    # the lines that precede the new ones.
+    index = _open_index(file_path)
+    previous_stamp = _file_stamp(file_path)
+    with open(file_path, "ab") as file:
+        offset = file.tell()
+        file.write(b"".join(lines))
+    for entry, line in zip(entries, lines):
+        index.apply(entry, offset)
+        offset += len(line)
+    index.mark_current()
+    _after_append(file_path, entries, previous_stamp)
+
+
+def _file_stamp(file_path: str) -> tuple:
+    """Get the (mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _after_append(file_path: str, entries: list, previous_stamp: tuple) -> None:
+    """
+    Update the in-memory structures derived from a file after entries were
+    appended to it. Call with the file lock held.
+
+    A structure built from the file as it was before the append is updated
+    in place; any other is dropped and rebuilt when next needed.
+    """
+    _record_cache.apply(file_path, entries, previous_stamp)
+    key = os.path.abspath(file_path)
+    trigram_index = _trigram_indexes.get(key)
+    if trigram_index is not None:
+        if trigram_index.stamp == previous_stamp:
+            trigram_index.apply(entries)
+            trigram_index.stamp = _file_stamp(file_path)
+        else:
+            del _trigram_indexes[key]
+
+
+def _normalize_name(name: str) -> str:
+    """Normalize a name for the index: collapse whitespace and ignore case."""
+    return " ".join(name.split()).casefold()
+
+
+def _index_key(key: str, value) -> bytes:
+    """Get the index key of a student_id or a name."""
+    if key == "name":
+        value = _normalize_name(value)
+    return f"{key}:{value}".encode()
+
+
+def _key_hash(index_key: bytes) -> int:
+    """Get the stable 64-bit hash of an index key."""
+    return int.from_bytes(hashlib.blake2b(index_key, digest_size=8).digest(), "little")
+
+
+class _StudentIndex:
+    """
+    A persistent hash index mapping student_id and normalized name to the
+    byte offsets of live records in a JSON Lines file.
+
+    The index file is memory-mapped and probed with linear probing, so a
+    lookup reads a few slots instead of the data file. The header records
+    the size and mtime of the data file the index is current for; an index
+    that does not match the data file is rebuilt when it is opened.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self.index_path = file_path + INDEX_SUFFIX
+        self._file = None
+        self._map = None
+        if not self._load():
+            self.rebuild()
+
+    def _load(self) -> bool:
+        """Map the index file, returning False if it is missing, invalid or stale."""
+        try:
+            file = open(self.index_path, "r+b")
+        except FileNotFoundError:
+            return False
+        try:
+            index_map = mmap.mmap(file.fileno(), 0)
+        except ValueError:
+            file.close()
+            return False
+        if len(index_map) < INDEX_HEADER.size or index_map[: len(INDEX_MAGIC)] != INDEX_MAGIC:
+            index_map.close()
+            file.close()
+            return False
+        _, capacity, used, size, mtime_ns = INDEX_HEADER.unpack_from(index_map)
+        if (
+            len(index_map) != INDEX_HEADER.size + capacity * INDEX_SLOT.size
+            or (size, mtime_ns) != self._data_stamp()
+        ):
+            index_map.close()
+            file.close()
+            return False
+        self._close()
+        self._file, self._map = file, index_map
+        self.capacity, self.used = capacity, used
+        return True
+
+    def _data_stamp(self) -> tuple:
+        """Get the (size, mtime_ns) of the data file."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return (0, 0)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def is_current(self) -> bool:
+        """Check whether the index matches the data file."""
+        return self._map is not None and INDEX_HEADER.unpack_from(self._map)[3:] == self._data_stamp()
+
+    def _create(self, capacity: int) -> None:
+        """Replace the index file with an empty table of the given capacity and map it."""
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(INDEX_HEADER.pack(INDEX_MAGIC, capacity, 0, 0, 0))
+            file.truncate(INDEX_HEADER.size + capacity * INDEX_SLOT.size)
+        os.replace(temp_path, self.index_path)
+        self._close()
+        self._file = open(self.index_path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.capacity, self.used = capacity, 0
+
+    def _close(self) -> None:
+        """Unmap and close the index file."""
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def rebuild(self) -> None:
+        """Rebuild the index from the data file."""
+        size = self._data_stamp()[0]
+        # Assume short records (about 50 bytes per line, two keys each).
+        self._create(_table_capacity(max(size // 25, 16)))
+        if size:
+            offset = 0
+            with open(self.file_path, "rb") as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    if line.strip():
+                        self.apply(json.loads(line), offset)
+                    offset += len(line)
+        self.mark_current()
+
+    def mark_current(self) -> None:
+        """Record that the index is current for the data file as it is now."""
+        size, mtime_ns = self._data_stamp()
+        INDEX_HEADER.pack_into(
+            self._map, 0, INDEX_MAGIC, self.capacity, self.used, size, mtime_ns
+        )
+
+    def apply(self, entry: dict, offset: int) -> None:
+        """Index a JSON Lines entry: insert a record or drop the records a tombstone removes."""
+        if entry.get(TOMBSTONE_KEY):
+            student_id = entry.get("student_id")
+            for slot, record_offset in list(self._probe(_index_key("student_id", student_id))):
+                record = _read_record(self.file_path, record_offset)
+                if record is not None and record.get("student_id") == student_id:
+                    self._delete_slot(slot)
+                    name_key = _index_key("name", record.get("name", ""))
+                    for name_slot, name_offset in self._probe(name_key):
+                        if name_offset == record_offset:
+                            self._delete_slot(name_slot)
+                            break
+            return
+        for key in INDEXED_KEYS:
+            if key in entry:
+                self._insert(_index_key(key, entry[key]), offset)
+
+    def lookup(self, key: str, value) -> list:
+        """Get the offsets of the live records whose key may equal the value, in file order."""
+        return sorted(offset for _, offset in self._probe(_index_key(key, value)))
+
+    def _probe(self, index_key: bytes):
+        """Yield (slot, offset) for the live slots holding the hash of the key."""
+        key_hash = _key_hash(index_key)
+        mask = self.capacity - 1
+        slot = key_hash & mask
+        while True:
+            slot_hash, value = INDEX_SLOT.unpack_from(
+                self._map, INDEX_HEADER.size + slot * INDEX_SLOT.size
+            )
+            if value == 0:
+                return
+            if slot_hash == key_hash and value != DELETED_SLOT:
+                yield slot, value - 1
+            slot = (slot + 1) & mask
+
+    def _insert(self, index_key: bytes, offset: int) -> None:
+        """Add a slot for the key, growing the table first if it is too full."""
+        if (self.used + 1) > self.capacity * MAX_LOAD_FACTOR:
+            self._grow()
+        key_hash = _key_hash(index_key)
+        self._put(key_hash, offset + 1)
+        self.used += 1
+
+    def _put(self, key_hash: int, value: int) -> None:
+        """Write a slot into the first empty position of its probe sequence."""
+        mask = self.capacity - 1
+        slot = key_hash & mask
+        while INDEX_SLOT.unpack_from(self._map, INDEX_HEADER.size + slot * INDEX_SLOT.size)[1]:
+            slot = (slot + 1) & mask
+        INDEX_SLOT.pack_into(
+            self._map, INDEX_HEADER.size + slot * INDEX_SLOT.size, key_hash, value
+        )
+
+    def _delete_slot(self, slot: int) -> None:
+        """Mark a slot as deleted, keeping its probe sequence intact."""
+        position = INDEX_HEADER.size + slot * INDEX_SLOT.size
+        key_hash = INDEX_SLOT.unpack_from(self._map, position)[0]
+        INDEX_SLOT.pack_into(self._map, position, key_hash, DELETED_SLOT)
+
+    def _grow(self) -> None:
+        """Rehash the live slots into a table twice as large, dropping deleted slots."""
+        live = [
+            (key_hash, value)
+            for key_hash, value in INDEX_SLOT.iter_unpack(self._map[INDEX_HEADER.size :])
+            if value and value != DELETED_SLOT
+        ]
+        self._create(_table_capacity(len(live) * 2 + 1))
+        for key_hash, value in live:
+            self._put(key_hash, value)
+        self.used = len(live)
+
+
+def _table_capacity(keys: int) -> int:
+    """Get the power-of-two table size that holds the keys below the maximum load factor."""
+    capacity = 16
+    while keys > capacity * MAX_LOAD_FACTOR:
+        capacity *= 2
+    return capacity
+
+
+def _open_index(file_path: str) -> _StudentIndex:
+    """Get the index of a JSON Lines file, rebuilding it if it is stale. Call with the file lock held."""
+    key = os.path.abspath(file_path)
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = _StudentIndex(file_path)
+    elif not index.is_current() and not index._load():
+        index.rebuild()
+    return index
+
+
+def _read_record(file_path: str, offset: int) -> dict:
+    """Read the JSON Lines entry starting at an offset."""
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        line = file.readline()
+    return json.loads(line) if line.endswith(b"\n") else None
+
+
+def _find_student(file_path: str, student_id: str) -> dict:
+    """Get the first live record of a student in a JSON Lines file. Call with the file lock held."""
+    if not os.path.exists(file_path):
+        return None
+    for offset in _open_index(file_path).lookup("student_id", student_id):
+        record = _read_record(file_path, offset)
+        if record is not None and record.get("student_id") == student_id:
+            return record
+    return None
+
+
+def _iter_jsonl(file_path: str):
+    """Yield the entries of a JSON Lines file, skipping a partially written last line."""
+    try:
+        file = open(file_path, "r")
+    except FileNotFoundError:
+        return
+    with file:
+        for line in file:
+            if not line.endswith("\n"):
+                return
+            if line.strip():
+                yield json.loads(line)
+
+
+def _replay(entries) -> list:
+    """Apply tombstones to a sequence of JSON Lines entries and get the live records in order."""
+    records = {}
+    positions = {}
+    for position, entry in enumerate(entries):
+        student_id = entry.get("student_id")
+        if entry.get(TOMBSTONE_KEY):
+            for dead in positions.pop(student_id, ()):
+                del records[dead]
+        else:
+            records[position] = entry
+            positions.setdefault(student_id, []).append(position)
+    return list(records.values())
+
+
+def _load_records(file_path: str) -> list:
+    """Load the live records of a file in either storage format."""
+    if _is_jsonl(file_path):
+        return _replay(_iter_jsonl(file_path))
+    try:
+        with open(file_path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return []
+
+
+def _record_size(record: dict) -> int:
+    """Estimate the memory used by a parsed record, not counting its keys, which are shared."""
+    return sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+
+
+class _CachedFile:
+    """The parsed live records of one file and the lookup dicts derived from them."""
+
+    def __init__(self, stamp: tuple, records: list) -> None:
+        self.stamp = stamp
+        self.records = {}
+        self.by_student = {}
+        self.lookups = {}
+        # Estimated memory used by the records and the dicts, in bytes
+        self.size = 0
+        self._next_number = 0
+        self.apply(records)
+
+    def apply(self, entries) -> None:
+        """Add records and remove the ones that tombstones delete, updating the lookup dicts."""
+        for entry in entries:
+            student_id = entry.get("student_id")
+            if entry.get(TOMBSTONE_KEY):
+                for number in self.by_student.pop(student_id, ()):
+                    record = self.records.pop(number)
+                    self.size -= self._entry_size(record)
+                    for key, lookup in self.lookups.items():
+                        matches = lookup.get(record.get(key))
+                        if matches is not None:
+                            matches.remove(record)
+                            if not matches:
+                                del lookup[record.get(key)]
+                continue
+            number = self._next_number
+            self._next_number += 1
+            self.records[number] = entry
+            self.by_student.setdefault(student_id, []).append(number)
+            for key, lookup in list(self.lookups.items()):
+                try:
+                    lookup.setdefault(entry.get(key), []).append(entry)
+                except TypeError:
+                    # An unhashable value; the lookup is rebuilt on next use.
+                    del self.lookups[key]
+                    self.size -= CACHED_LOOKUP_OVERHEAD * (len(self.records) - 1)
+            self.size += self._entry_size(entry)
+
+    def find(self, key: str, value) -> dict:
+        """Get the first record whose key equals the value, building the lookup dict on first use."""
+        lookup = self.lookups.get(key)
+        if lookup is None:
+            lookup = {}
+            for record in self.records.values():
+                lookup.setdefault(record.get(key), []).append(record)
+            self.lookups[key] = lookup
+            self.size += CACHED_LOOKUP_OVERHEAD * len(self.records)
+        matches = lookup.get(value)
+        return matches[0] if matches else None
+
+    def _entry_size(self, record: dict) -> int:
+        """Estimate the memory a record takes in the cache, with its lookup dict entries."""
+        return _record_size(record) + CACHED_RECORD_OVERHEAD + CACHED_LOOKUP_OVERHEAD * len(self.lookups)
+
+
+class _RecordCache:
+    """
+    A process-level cache of parsed student records, shared by all callers.
+
+    Entries are keyed by file path and validated against the file's
+    (mtime_ns, size), so a file changed by another process is re-read.
+    Appends made through this module update the cached entry in place.
+
+    A file is only parsed into the cache when it is searched a second time
+    without changing in between; the first search streams it or uses its
+    index and stops at the first match. Entries are evicted least recently
+    used first once their estimated memory adds up to more than
+    ``max_bytes``, and a file whose records alone would not fit is not cached.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        # Stamps of files searched once, and of files too large to cache
+        self._seen = OrderedDict()
+        self._oversized = OrderedDict()
+        self._lock = threading.Lock()
+
+    def find(self, file_path: str, key: str, value):
+        """
+        Get the first live record whose key equals the value, loading the file on a miss.
+
+        Returns the record, None if there is none, or _UNCACHED if the file
+        is not cached and should be searched directly.
+        """
+        path = os.path.abspath(file_path)
+        stamp = _file_stamp(file_path)
+        if stamp is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.stamp == stamp:
+                self.hits += 1
+                self._entries.move_to_end(path)
+                return self._find(path, entry, key, value)
+            self.misses += 1
+            if stamp[1] * MIN_PARSED_BYTES_PER_SOURCE_BYTE > self.max_bytes:
+                return _UNCACHED
+            if self._oversized.get(path) == stamp:
+                return _UNCACHED
+            if self._seen.get(path) != stamp:
+                self._remember(self._seen, path, stamp)
+                return _UNCACHED
+            del self._seen[path]
+
+        with _file_lock(file_path):
+            stamp = _file_stamp(file_path)
+            entry = _CachedFile(stamp, _load_records(file_path))
+        with self._lock:
+            if entry.size > self.max_bytes:
+                self._remember(self._oversized, path, stamp)
+                return _UNCACHED
+            self._store(path, entry)
+            return self._find(path, entry, key, value)
+
+    def apply(self, file_path: str, entries: list, previous_stamp: tuple) -> None:
+        """Apply appended entries to a cached file that was current before the append."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                if previous_stamp is not None and self._seen.get(path) == previous_stamp:
+                    self._seen[path] = _file_stamp(file_path)
+                return
+            if entry.stamp != previous_stamp:
+                self._drop(path)
+                return
+            size = entry.size
+            entry.apply(entries)
+            entry.stamp = _file_stamp(file_path)
+            self._size += entry.size - size
+            self._evict()
+
+    def stats(self) -> dict:
+        """Get the hit, miss and eviction counts and the estimated memory used by the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "files": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self._oversized.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def _find(self, path: str, entry: _CachedFile, key: str, value):
+        """Look a value up in a cached entry, accounting for a lookup dict it builds."""
+        size = entry.size
+        try:
+            return entry.find(key, value)
+        except TypeError:
+            return _UNCACHED
+        finally:
+            if entry.size != size and self._entries.get(path) is entry:
+                self._size += entry.size - size
+                self._evict()
+
+    def _remember(self, stamps: OrderedDict, path: str, stamp: tuple) -> None:
+        """Remember the stamp of a file, forgetting the oldest files beyond the limit."""
+        stamps[path] = stamp
+        stamps.move_to_end(path)
+        while len(stamps) > RECORD_CACHE_SEEN_FILES:
+            stamps.popitem(last=False)
+
+    def _store(self, path: str, entry: _CachedFile) -> None:
+        """Insert or replace an entry and evict old entries if the cache is too large."""
+        self._drop(path)
+        self._entries[path] = entry
+        self._size += entry.size
+        self._evict()
+
+    def _drop(self, path: str) -> None:
+        """Remove an entry if it is cached."""
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _evict(self) -> None:
+        """Evict least recently used entries until the cache fits in max_bytes."""
+        while self._size > self.max_bytes and self._entries:
+            path = next(iter(self._entries))
+            self._drop(path)
+            self.evictions += 1
+
+
+_UNCACHED = object()
+_record_cache = _RecordCache(RECORD_CACHE_MAX_BYTES)
+
+
+def record_cache_stats() -> dict:
+    """
+    Get the statistics of the process-level student record cache.
+
+    Returns:
+        dict: The hits, misses, evictions, cached files and their estimated memory in bytes.
+    """
+    return _record_cache.stats()
+
+
+def clear_record_cache() -> None:
+    """
+    Empty the process-level student record cache and reset its statistics.
+
+    Returns:
+        None
+    """
+    _record_cache.clear()
+
+
+def _write_atomic(file_path: str, text: str) -> None:
+    """Write the text to a temporary file, fsync it and rename it over the file."""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        if os.path.exists(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o777)
+        with os.fdopen(fd, "w") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
 
 
 def add_student_record(
@@ -7,6 +636,9 @@ def add_student_record(
     """
     Add a new student record to the records and save it to a JSON file.
 
+    The record is appended in place: as one line with JSON Lines storage,
+    or before the closing bracket of the JSON array otherwise.
+
     Args:
         file_path (str): The path to the JSON file.
         student_id (str): The student ID.
@@ -14,17 +646,283 @@ def add_student_record(
         age (int): The age of the student.
         grade (str): The grade of the student.
     """
+    add_student_records(
+        file_path, [{"student_id": student_id, "name": name, "age": age, "grade": grade}]
+    )
+
+
+def add_student_records(file_path: str, records, batch_size: int = 10000) -> int:
+    """
+    Add many student records, writing each batch with a single I/O pass.
+
+    Each batch is appended to the end of the file without reading or
+    rewriting the records already in it.
+
+    Args:
+        file_path (str): The path to the JSON file.
+        records (iterable): Dictionaries with student_id, name, age and grade.
+        batch_size (int): The number of records written per batch.
+
+    Returns:
+        int: The number of records added.
+    """
+    added = 0
+    batch = []
+    for record in records:
+        batch.append(
+            {
+                "student_id": record["student_id"],
+                "name": record["name"],
+                "age": record["age"],
+                "grade": record["grade"],
+            }
+        )
+        if len(batch) >= batch_size:
+            added += _write_batch(file_path, batch)
+            batch = []
+    if batch:
+        added += _write_batch(file_path, batch)
+    return added
+
+
+def _write_batch(file_path: str, batch: list) -> int:
+    """Append a batch of records to a file in either storage format."""
+    if _is_jsonl(file_path):
+        _append_lines(file_path, batch)
+    else:
+        _append_to_json_array(file_path, batch)
+    return len(batch)
+
+
+def _append_to_json_array(file_path: str, records: list) -> None:
+    """Insert records before the closing bracket of a JSON array file."""
+    encoded = ", ".join(json.dumps(record) for record in records).encode()
+    with _file_lock(file_path):
+        previous_stamp = _file_stamp(file_path)
+        try:
+            file = open(file_path, "r+b")
+        except FileNotFoundError:
+            with open(file_path, "wb") as file:
+                file.write(b"[" + encoded + b"]")
+            _after_append(file_path, records, previous_stamp)
+            return
+        with file:
+            end = file.seek(0, os.SEEK_END)
+            tail = b""
+            while not tail.rstrip():
+                if end == 0:
+                    raise ValueError(f"{file_path} does not contain a JSON array")
+                step = min(end, 4096)
+                end -= step
+                file.seek(end)
+                tail = file.read(step) + tail
+            tail = tail.rstrip()
+            if not tail.endswith(b"]"):
+                raise ValueError(f"{file_path} does not contain a JSON array")
+            closing = end + len(tail) - 1
+            # Look back past whitespace to see whether the array is empty.
+            start = closing
+            before = b""
+            while not before and start > 0:
+                step = min(start, 4096)
+                start -= step
+                file.seek(start)
+                before = file.read(step).rstrip()
+            separator = b"" if before.endswith(b"[") else b", "
+            file.seek(closing)
+            file.write(separator + encoded + b"]")
+            file.truncate()
+        _after_append(file_path, records, previous_stamp)
+
+
+def iter_student_records(file_path: str, chunk_size: int = 1 << 20):
+    """
+    Yield the student records of a file one at a time.
+
+    JSON array files are parsed incrementally, chunk by chunk, so memory use
+    does not grow with the file size. JSON Lines files are replayed first,
+    since a later tombstone can remove an earlier record.
+
+    Args:
+        file_path (str): The path to the JSON file.
+        chunk_size (int): The number of characters read at a time.
+
+    Yields:
+        dict: Each student record, in file order.
+    """
+    if _is_jsonl(file_path):
+        yield from _load_records(file_path)
+        return
+
+    decoder = json.JSONDecoder()
     try:
-        with open(file_path, "r") as file:
-            records = json.load(file)
+        file = open(file_path, "r")
     except FileNotFoundError:
-        records = []
+        return
+    with file:
+        buffer = file.read(chunk_size)
+        position = _skip_whitespace(buffer, 0)
+        while position == len(buffer) and buffer:
+            # Leading whitespace longer than a chunk.
+            buffer = file.read(chunk_size)
+            position = _skip_whitespace(buffer, 0)
+        if buffer[position : position + 1] != "[":
+            raise ValueError(f"{file_path} does not contain a JSON array")
+        position += 1
+        at_eof = False
+        while True:
+            position = _skip_whitespace(buffer, position)
+            if position < len(buffer) and buffer[position] in ",]":
+                if buffer[position] == "]":
+                    return
+                position = _skip_whitespace(buffer, position + 1)
+            if position < len(buffer):
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if at_eof:
+                        raise
+                else:
+                    # A record that ends exactly at the end of the buffer may be
+                    # a truncated number; read more before trusting it.
+                    if end < len(buffer) or at_eof:
+                        yield record
+                        position = end
+                        continue
+            elif at_eof:
+                raise ValueError(f"{file_path} ends before the JSON array is closed")
+            chunk = file.read(chunk_size)
+            at_eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def _skip_whitespace(text: str, position: int) -> int:
+    """Get the position of the first non-whitespace character at or after a position."""
+    while position < len(text) and text[position] in " \t\r\n":
+        position += 1
+    return position
+
+
+def update_student_record(file_path: str, student_id: str, **changes) -> bool:
+    """
+    Update the fields of a student record.
+
+    With JSON Lines storage the record is found through the index and a
+    tombstone for it and the updated record are appended, all under the file
+    lock, instead of rewriting the file. A JSON array file is rewritten
+    atomically under the file lock.
+
+    Args:
+        file_path (str): The path to the JSON file.
+        student_id (str): The student ID.
+        **changes: The fields to change, e.g. age=19 or grade="B".
+
+    Returns:
+        bool: True if the student was found and updated, False otherwise.
+    """
+    if _is_jsonl(file_path):
+        with _file_lock(file_path):
+            current = _find_student(file_path, student_id)
+            if current is None:
+                return False
+            updated = {**current, **changes, "student_id": student_id}
+            _append_lines_locked(file_path, [{"student_id": student_id, TOMBSTONE_KEY: True}, updated])
+        return True
+
+    with _file_lock(file_path):
+        records = _load_records(file_path)
+        current = next(
+            (record for record in records if record.get("student_id") == student_id), None
+        )
+        if current is None:
+            return False
+        updated = {**current, **changes, "student_id": student_id}
+        records = [
+            updated if record is current else record
+            for record in records
+            if record is current or record.get("student_id") != student_id
+        ]
+        _write_atomic(file_path, json.dumps(records))
+    return True
+
+
+def delete_student_record(file_path: str, student_id: str) -> bool:
+    """
+    Delete the records of a student.
+
+    With JSON Lines storage the record is found through the index and a
+    tombstone is appended, both under the file lock, instead of rewriting
+    the file. A JSON array file is rewritten atomically under the file lock.
+
+    Args:
+        file_path (str): The path to the JSON file.
+        student_id (str): The student ID.
+
+    Returns:
+        bool: True if the student was found and deleted, False otherwise.
+    """
+    if _is_jsonl(file_path):
+        with _file_lock(file_path):
+            if _find_student(file_path, student_id) is None:
+                return False
+            _append_lines_locked(file_path, [{"student_id": student_id, TOMBSTONE_KEY: True}])
+        return True
+
+    with _file_lock(file_path):
+        records = _load_records(file_path)
+        remaining = [record for record in records if record.get("student_id") != student_id]
+        if len(remaining) == len(records):
+            return False
+        _write_atomic(file_path, json.dumps(remaining))
+    return True
 
-    new_record = {"student_id": student_id, "name": name, "age": age, "grade": grade}
-    records.append(new_record)
 
-    with open(file_path, "w") as file:
-        json.dump(records, file)
+def compact_student_records(file_path: str, background: bool = False):
+    """
+    Rewrite a JSON Lines file with only its live records, dropping tombstones
+    and superseded records.
+
+    The file is read and compacted without blocking writers. Only the final
+    step, which copies lines appended in the meantime and atomically renames
+    the compacted file into place, holds the file lock.
+
+    Args:
+        file_path (str): The path to the JSON Lines file.
+        background (bool): Run the compaction on a background thread.
+
+    Returns:
+        threading.Thread or None: The compaction thread if background is True, None otherwise.
+    """
+    if not _is_jsonl(file_path):
+        raise ValueError(f"Compaction needs JSON Lines storage ({JSONL_SUFFIX})")
+    if background:
+        thread = threading.Thread(
+            target=compact_student_records, args=(file_path,), daemon=True
+        )
+        thread.start()
+        return thread
+
+    try:
+        with open(file_path, "rb") as file:
+            snapshot = file.read()
+    except FileNotFoundError:
+        return None
+    # Only complete lines are compacted; a partial last line is carried over below.
+    snapshot = snapshot[: snapshot.rfind(b"\n") + 1]
+    entries = (json.loads(line) for line in snapshot.splitlines() if line.strip())
+    compacted = "".join(json.dumps(record) + "\n" for record in _replay(entries))
+
+    with _file_lock(file_path):
+        with open(file_path, "rb") as file:
+            file.seek(len(snapshot))
+            appended = file.read().decode()
+        # Entries appended during compaction replay correctly after the live
+        # set: their tombstones only refer to records that precede them.
+        _write_atomic(file_path, compacted + appended)
+        # Record offsets changed, so the index is rebuilt for the new file.
+        _open_index(file_path)
+    return None
 
 
 def search_student(file_path: str, key: str, value: str) -> dict:
@@ -39,19 +937,582 @@ def search_student(file_path: str, key: str, value: str) -> dict:
     Returns:
         dict: A dictionary containing the student's age and grade, if found. None otherwise.
     """
-    try:
-        with open(file_path, "r") as file:
-            records = json.load(file)
-    except FileNotFoundError:
+    if not os.path.exists(file_path):
         return None
 
-    for record in records:
+    record = _record_cache.find(file_path, key, value)
+    if record is not _UNCACHED:
+        if record is None:
+            return None
+        return {"age": record["age"], "grade": record["grade"]}
+
+    if _is_jsonl(file_path) and key in INDEXED_KEYS:
+        with _file_lock(file_path):
+            offsets = _open_index(file_path).lookup(key, value)
+        for offset in offsets:
+            record = _read_record(file_path, offset)
+            if record is not None and record.get(key) == value:
+                return {"age": record["age"], "grade": record["grade"]}
+        return None
+
+    for record in iter_student_records(file_path):
         if record.get(key) == value:
             return {"age": record["age"], "grade": record["grade"]}
 
     return None
 
 
+def _trigrams(name: str, padded: bool = True) -> set:
+    """Get the trigrams of a normalized name, padded so word edges form their own trigrams."""
+    if padded:
+        name = f" {name} "
+    return {name[i : i + TRIGRAM_SIZE] for i in range(len(name) - TRIGRAM_SIZE + 1)}
+
+
+def _edit_distance(first: str, second: str, max_distance: int, partial: bool = False) -> int:
+    """
+    Get the Levenshtein distance between two strings, or max_distance + 1 once
+    it is known to exceed max_distance.
+
+    With partial, get the distance between the first string and the closest
+    substring of the second one instead.
+    """
+    if partial:
+        previous = [0] * (len(second) + 1)
+    elif abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    else:
+        previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (first_char != second_char),
+                )
+            )
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous) if partial else previous[-1]
+
+
+class _TrigramIndex:
+    """
+    An in-memory inverted index from name trigrams to the records of a file.
+
+    Records are numbered in file order. ``postings`` maps each trigram to
+    the set of record numbers whose normalized name contains it.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.stamp = _file_stamp(file_path)
+        self.records = []
+        self.names = []
+        self.trigram_counts = []
+        self.postings = {}
+        self.by_student = {}
+        self.apply(iter_student_records(file_path))
+
+    def apply(self, entries) -> None:
+        """Add records to the index and remove the ones that tombstones delete."""
+        for entry in entries:
+            student_id = entry.get("student_id")
+            if entry.get(TOMBSTONE_KEY):
+                for number in self.by_student.pop(student_id, ()):
+                    for trigram in _trigrams(self.names[number]):
+                        self.postings[trigram].discard(number)
+                    self.records[number] = self.names[number] = None
+                continue
+            number = len(self.records)
+            name = _normalize_name(entry.get("name", ""))
+            trigrams = _trigrams(name)
+            self.records.append(entry)
+            self.names.append(name)
+            self.trigram_counts.append(len(trigrams))
+            self.by_student.setdefault(student_id, []).append(number)
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, set()).add(number)
+
+    def search(self, query: str, max_distance: int, partial: bool) -> list:
+        """Get (distance, record number) pairs for names within max_distance of the query."""
+        # A partial query can match in the middle of a word, so its edges
+        # are not padded unless it is too short to have any trigram.
+        padded = not partial or len(query) < TRIGRAM_SIZE
+        query_trigrams = _trigrams(query, padded)
+        # Each edit changes at most TRIGRAM_SIZE trigrams, so a match shares
+        # at least this many trigrams with the query. The padded trigrams of
+        # a short partial query only mark word edges, which a match inside a
+        # word does not share, so any one of them is enough.
+        if partial and padded:
+            required = 1
+        else:
+            required = max(len(query_trigrams) - max_distance * TRIGRAM_SIZE, 1)
+        postings = sorted(
+            (self.postings.get(trigram, set()) for trigram in query_trigrams), key=len
+        )
+        # A record that shares `required` trigrams must appear in at least one
+        # of the rarest len - required + 1 posting lists, so only those lists
+        # generate candidates; the others are probed for the survivors.
+        prefix_length = len(postings) - required + 1
+        shared_counts = Counter()
+        for posting in postings[:prefix_length]:
+            shared_counts.update(posting)
+        remaining = postings[prefix_length:]
+
+        matches = []
+        for number, shared in shared_counts.items():
+            name = self.names[number]
+            if partial:
+                if len(name) < len(query) - max_distance:
+                    continue
+                # Trigrams of the rest of the name do not count against a partial match.
+                bound = required
+            else:
+                if abs(len(name) - len(query)) > max_distance:
+                    continue
+                bound = max(len(query_trigrams), self.trigram_counts[number]) - max_distance * TRIGRAM_SIZE
+            allowed_misses = len(remaining) - (bound - shared)
+            if allowed_misses < 0:
+                continue
+            if allowed_misses < len(remaining):
+                for posting in remaining:
+                    if number not in posting:
+                        allowed_misses -= 1
+                        if allowed_misses < 0:
+                            break
+                if allowed_misses < 0:
+                    continue
+            distance = _edit_distance(query, name, max_distance, partial)
+            if distance <= max_distance:
+                matches.append((distance, number))
+        return sorted(matches)
+
+
+def fuzzy_search_students(
+    file_path: str,
+    name: str,
+    max_distance: int = 2,
+    limit: int = 10,
+    partial: bool = True,
+) -> list:
+    """
+    Search for students whose name is close to a partial or misspelled name.
+
+    Names are compared case-insensitively with collapsed whitespace. A
+    trigram index prunes the candidates, and only the candidates that share
+    enough trigrams with the query are ranked by edit distance. The index
+    is built on first use and kept up to date by add_student_record.
+    Names that share no trigram with the query are never matched.
+
+    Args:
+        file_path (str): The path to the JSON file.
+        name (str): The name to search for.
+        max_distance (int): The largest edit distance of a match.
+        limit (int): The maximum number of matches returned.
+        partial (bool): Match the name against any part of a student's name, e.g. "bhatarai".
+
+    Returns:
+        list: The matching records, closest first, each with an added "distance" key.
+    """
+    if not os.path.exists(file_path):
+        return []
+    query = _normalize_name(name)
+    key = os.path.abspath(file_path)
+    with _file_lock(file_path):
+        index = _trigram_indexes.get(key)
+        if index is None or index.stamp != _file_stamp(file_path):
+            index = _trigram_indexes[key] = _TrigramIndex(file_path)
+        matches = index.search(query, max_distance, partial)[:limit]
+        return [
+            {**index.records[number], "distance": distance}
+            for distance, number in matches
+        ]
+
+
+class TestJsonArrayStorage(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.file_path = os.path.join(temp_dir.name, "students.json")
+
+    def _write(self, text):
+        with open(self.file_path, "w") as file:
+            file.write(text)
+
+    def _read(self):
+        with open(self.file_path) as file:
+            return json.load(file)
+
+    def test_append_scans_back_past_whitespace(self):
+        record = {"student_id": "1", "name": "Ann Lee", "age": 18, "grade": "A"}
+        for text, existing in [
+            ("[]", []),
+            ("[" + " " * 5000 + "]", []),
+            ("[\n" + "\n" * 9000 + "]" + " \n" * 5000, []),
+            (json.dumps([record]) + " " * 10000, [record]),
+            (json.dumps([record], indent=4) + "\n", [record]),
+        ]:
+            self._write(text)
+            _append_to_json_array(self.file_path, [record, {**record, "student_id": "2"}])
+            self.assertEqual(self._read(), existing + [record, {**record, "student_id": "2"}])
+
+    def test_append_creates_and_rejects_files(self):
+        _append_to_json_array(self.file_path, [{"student_id": "1"}])
+        self.assertEqual(self._read(), [{"student_id": "1"}])
+        for text in ("", " \n " * 3000, '{"student_id": "1"}'):
+            self._write(text)
+            with self.assertRaises(ValueError):
+                _append_to_json_array(self.file_path, [{"student_id": "2"}])
+
+    def test_iter_records_across_chunk_boundaries(self):
+        records = [
+            {"student_id": str(number), "name": f"Student \u00e9 {number}", "age": 10 ** (number % 9), "grade": 1.5 * number}
+            for number in range(40)
+        ]
+        for text in (json.dumps(records), json.dumps(records, indent=2), " \n" + json.dumps(records) + " \n"):
+            self._write(text)
+            for chunk_size in range(1, 24):
+                self.assertEqual(list(iter_student_records(self.file_path, chunk_size=chunk_size)), records)
+
+    def test_iter_records_does_not_trust_a_number_cut_at_the_chunk_end(self):
+        self._write("[1234, 5678]")
+        # Chunks "[123" and "4, 56": both numbers are split across reads.
+        self.assertEqual(list(iter_student_records(self.file_path, chunk_size=4)), [1234, 5678])
+        self.assertEqual(list(iter_student_records(self.file_path, chunk_size=5)), [1234, 5678])
+
+    def test_iter_records_edge_cases(self):
+        for text in ("[]", " [ ] ", "[\n\n]"):
+            self._write(text)
+            self.assertEqual(list(iter_student_records(self.file_path, chunk_size=1)), [])
+        for text in ("[1, 2", '{"student_id": "1"}', "[1, {]"):
+            self._write(text)
+            with self.assertRaises(ValueError):
+                list(iter_student_records(self.file_path, chunk_size=2))
+        self.assertEqual(list(iter_student_records(self.file_path + ".missing")), [])
+
+
+class TestStudentIndex(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.file_path = os.path.join(temp_dir.name, "students.jsonl")
+        self.addCleanup(self._close_index)
+        # Go through the index rather than the record cache.
+        patcher = mock.patch.object(_record_cache, "find", return_value=_UNCACHED)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _close_index(self):
+        index = _indexes.pop(os.path.abspath(self.file_path), None)
+        if index is not None:
+            index._close()
+
+    def _index(self):
+        with _file_lock(self.file_path):
+            return _open_index(self.file_path)
+
+    def _add(self, count, start=0):
+        for number in range(start, start + count):
+            add_student_record(self.file_path, f"S{number}", f"Student {number}", 18 + number % 5, "A")
+
+    def test_tombstones_delete_slots_without_breaking_probe_chains(self):
+        # Every key hashes alike, so all records share one probe chain.
+        with mock.patch(f"{__name__}._key_hash", return_value=3):
+            self._add(5)
+            self.assertTrue(delete_student_record(self.file_path, "S2"))
+            index = self._index()
+            self.assertEqual(len(index.lookup("student_id", "S0")), 8)
+            for number in (0, 1, 3, 4):
+                self.assertEqual(
+                    search_student(self.file_path, "student_id", f"S{number}"),
+                    {"age": 18 + number, "grade": "A"},
+                )
+                self.assertEqual(
+                    search_student(self.file_path, "name", f"Student {number}"),
+                    {"age": 18 + number, "grade": "A"},
+                )
+            self.assertIsNone(search_student(self.file_path, "student_id", "S2"))
+            self.assertIsNone(search_student(self.file_path, "name", "Student 2"))
+            slots = [value for _, value in INDEX_SLOT.iter_unpack(index._map[INDEX_HEADER.size :])]
+            self.assertEqual(slots.count(DELETED_SLOT), 2)
+            self.assertEqual(index.used, 10)
+
+    def test_grow_rehashes_live_slots(self):
+        self._add(10)
+        index = self._index()
+        self.assertEqual((index.capacity, index.used), (32, 20))
+        for number in range(3):
+            delete_student_record(self.file_path, f"S{number}")
+        self.assertEqual(index.used, 20)
+        self._add(30, start=10)
+        self.assertGreater(index.capacity, 64)
+        # The deleted slots were dropped by the first rehash.
+        self.assertEqual(index.used, 2 * 37)
+        self.assertTrue(index.is_current())
+        # Lookups normalize names, so a differently spaced name probes the same slots.
+        self.assertEqual(index.lookup("name", "  student   7"), index.lookup("name", "Student 7"))
+        for number in range(40):
+            expected = None if number < 3 else {"age": 18 + number % 5, "grade": "A"}
+            self.assertEqual(search_student(self.file_path, "student_id", f"S{number}"), expected)
+            self.assertEqual(len(index.lookup("name", f"Student {number}")), 0 if number < 3 else 1)
+
+    def test_stale_index_is_rebuilt(self):
+        self._add(3)
+        with open(self.file_path, "a") as file:
+            file.write(json.dumps({"student_id": "S9", "name": "Late Writer", "age": 30, "grade": "C"}) + "\n")
+        self.assertFalse(_indexes[os.path.abspath(self.file_path)].is_current())
+        self.assertEqual(search_student(self.file_path, "student_id", "S9"), {"age": 30, "grade": "C"})
+
+        # A current index file is mapped again rather than rebuilt.
+        self._close_index()
+        with mock.patch.object(_StudentIndex, "rebuild") as rebuild:
+            self.assertEqual(search_student(self.file_path, "name", "Late Writer"), {"age": 30, "grade": "C"})
+            rebuild.assert_not_called()
+
+        # A corrupt index file is rebuilt.
+        self._close_index()
+        with open(self.file_path + INDEX_SUFFIX, "r+b") as file:
+            file.write(b"NOTINDEX")
+        self.assertEqual(search_student(self.file_path, "student_id", "S1"), {"age": 19, "grade": "A"})
+        with open(self.file_path + INDEX_SUFFIX, "rb") as file:
+            self.assertEqual(file.read(len(INDEX_MAGIC)), INDEX_MAGIC)
+
+        # So is an index file shorter than its header, e.g. after a crash.
+        self._close_index()
+        with open(self.file_path + INDEX_SUFFIX, "r+b") as file:
+            file.truncate(10)
+        self.assertEqual(search_student(self.file_path, "student_id", "S2"), {"age": 20, "grade": "A"})
+        with open(self.file_path + INDEX_SUFFIX, "rb") as file:
+            self.assertEqual(file.read(len(INDEX_MAGIC)), INDEX_MAGIC)
+
+    def test_lookup_is_verified_against_the_record(self):
+        self._add(2)
+        with open(self.file_path, "rb") as file:
+            second_offset = len(file.readline())
+        index = self._index()
+        # A hash collision points the key of S0 at the record of S1 as well.
+        index._insert(_index_key("student_id", "S0"), second_offset)
+        self.assertEqual(index.lookup("student_id", "S0"), [0, second_offset])
+        index._insert(_index_key("student_id", "S7"), second_offset)
+        index.mark_current()
+        self.assertEqual(search_student(self.file_path, "student_id", "S0"), {"age": 18, "grade": "A"})
+        self.assertIsNone(search_student(self.file_path, "student_id", "S7"))
+
+
+class TestFuzzySearch(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+        self.random = random.Random(39)
+
+    def _random_name(self):
+        # A small alphabet gives repeated trigrams and many near matches.
+        return " ".join(
+            "".join(self.random.choice("abcde") for _ in range(self.random.randint(1, 6)))
+            for _ in range(self.random.randint(1, 3))
+        )
+
+    def _brute_force(self, file_path, query, max_distance, partial):
+        """Rank every live record by edit distance, as the index should."""
+        query = _normalize_name(query)
+        query_trigrams = _trigrams(query, padded=not partial or len(query) < TRIGRAM_SIZE)
+        matches = []
+        for position, record in enumerate(_load_records(file_path)):
+            name = _normalize_name(record["name"])
+            if not query_trigrams & _trigrams(name):
+                # Documented: names that share no trigram are never matched.
+                continue
+            distance = _edit_distance(query, name, max_distance, partial)
+            if distance <= max_distance:
+                matches.append((distance, position, record["student_id"]))
+        return [(distance, student_id) for distance, _, student_id in sorted(matches)]
+
+    def _check(self, file_path, queries=60):
+        for _ in range(queries):
+            query = self._random_name()
+            for max_distance in range(4):
+                for partial in (False, True):
+                    found = fuzzy_search_students(file_path, query, max_distance, limit=10 ** 6, partial=partial)
+                    self.assertEqual(
+                        [(record["distance"], record["student_id"]) for record in found],
+                        self._brute_force(file_path, query, max_distance, partial),
+                        (query, max_distance, partial),
+                    )
+
+    def test_matches_brute_force(self):
+        file_path = os.path.join(self.directory, "students.json")
+        add_student_records(
+            file_path,
+            (
+                {"student_id": str(number), "name": self._random_name(), "age": 18, "grade": "A"}
+                for number in range(300)
+            ),
+        )
+        self._check(file_path)
+
+    def test_matches_brute_force_after_tombstones(self):
+        file_path = os.path.join(self.directory, "students.jsonl")
+        for number in range(150):
+            add_student_record(file_path, str(number), self._random_name(), 18, "A")
+        fuzzy_search_students(file_path, "abc")
+        index = _trigram_indexes[os.path.abspath(file_path)]
+        for _ in range(100):
+            student_id = str(self.random.randrange(150))
+            if self.random.random() < 0.5:
+                update_student_record(file_path, student_id, name=self._random_name())
+            else:
+                delete_student_record(file_path, student_id)
+                add_student_record(file_path, student_id, self._random_name(), 19, "B")
+        self._check(file_path, queries=30)
+        # The index was kept up to date by the appends, not rebuilt.
+        self.assertIs(_trigram_indexes[os.path.abspath(file_path)], index)
+
+    def test_count_and_prefix_filters(self):
+        file_path = os.path.join(self.directory, "students.json")
+        names = ["Aavash Bhattarai", "Avash Bhatarai", "Aavash Bhattara", "Bhattarai", "Samyam Aryal", "Bhat Tarai"]
+        add_student_records(
+            file_path,
+            ({"student_id": str(number), "name": name, "age": 18, "grade": "A"} for number, name in enumerate(names)),
+        )
+        for query in ("aavash bhattarai", "bhatarai", "bhattari", "samyam", "tarai"):
+            for max_distance in range(4):
+                for partial in (False, True):
+                    found = fuzzy_search_students(file_path, query, max_distance, limit=10, partial=partial)
+                    self.assertEqual(
+                        [(record["distance"], record["student_id"]) for record in found],
+                        self._brute_force(file_path, query, max_distance, partial),
+                    )
+        found = fuzzy_search_students(file_path, "bhatarai", 1, partial=True)
+        self.assertEqual([record["name"] for record in found][:2], ["Avash Bhatarai", "Aavash Bhattarai"])
+
+
+class TestRecordCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        clear_record_cache()
+        self.addCleanup(clear_record_cache)
+
+    def _write_array(self, name, count):
+        file_path = os.path.join(self.temp_dir.name, name)
+        records = [
+            {"student_id": str(number), "name": f"Student {number}", "age": 18, "grade": "A"}
+            for number in range(count)
+        ]
+        with open(file_path, "w") as file:
+            json.dump(records, file)
+        return file_path
+
+    def test_first_search_streams_json_array(self):
+        file_path = self._write_array("students.json", 100)
+        with mock.patch(f"{__name__}._load_records", wraps=_load_records) as load_records:
+            self.assertEqual(search_student(file_path, "student_id", "3"), {"age": 18, "grade": "A"})
+            load_records.assert_not_called()
+            self.assertEqual(record_cache_stats()["files"], 0)
+            self.assertEqual(search_student(file_path, "student_id", "7"), {"age": 18, "grade": "A"})
+            load_records.assert_called_once()
+        self.assertEqual(search_student(file_path, "student_id", "missing"), None)
+        self.assertEqual(
+            {key: record_cache_stats()[key] for key in ("hits", "misses", "files")},
+            {"hits": 1, "misses": 2, "files": 1},
+        )
+
+    def test_appends_keep_a_seen_file_eligible(self):
+        file_path = self._write_array("students.json", 10)
+        search_student(file_path, "student_id", "1")
+        add_student_record(file_path, "10", "Student 10", 19, "B")
+        self.assertEqual(search_student(file_path, "student_id", "10"), {"age": 19, "grade": "B"})
+        self.assertEqual(record_cache_stats()["files"], 1)
+
+    def test_size_is_estimated_memory(self):
+        file_path = self._write_array("students.json", 1000)
+        search_student(file_path, "student_id", "1")
+        search_student(file_path, "student_id", "1")
+        stats = record_cache_stats()
+        self.assertGreater(stats["bytes"], MIN_PARSED_BYTES_PER_SOURCE_BYTE * os.path.getsize(file_path))
+        search_student(file_path, "name", "Student 1")
+        self.assertGreater(record_cache_stats()["bytes"], stats["bytes"] + 1000 * CACHED_LOOKUP_OVERHEAD - 1)
+
+    def test_files_that_do_not_fit_are_not_cached(self):
+        small = self._write_array("small.json", 10)
+        large = self._write_array("large.json", 200)
+        max_bytes = MIN_PARSED_BYTES_PER_SOURCE_BYTE * os.path.getsize(large)
+        with mock.patch.object(_record_cache, "max_bytes", max_bytes):
+            for _ in range(3):
+                self.assertEqual(search_student(large, "student_id", "199"), {"age": 18, "grade": "A"})
+            self.assertEqual(record_cache_stats()["files"], 0)
+            self.assertEqual(_record_cache._oversized[os.path.abspath(large)], _file_stamp(large))
+            for _ in range(2):
+                search_student(small, "student_id", "1")
+            self.assertEqual(record_cache_stats()["files"], 1)
+            self.assertLessEqual(record_cache_stats()["bytes"], max_bytes)
+
+
+class TestRewrites(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_rewrites_keep_the_file_mode(self):
+        for name in ("students.json", "students.jsonl"):
+            file_path = os.path.join(self.temp_dir.name, name)
+            add_student_record(file_path, "1", "Ann Lee", 18, "A")
+            add_student_record(file_path, "2", "Bo Park", 19, "B")
+            os.chmod(file_path, 0o640)
+            if _is_jsonl(file_path):
+                self.assertTrue(delete_student_record(file_path, "2"))
+                compact_student_records(file_path)
+            else:
+                self.assertTrue(update_student_record(file_path, "1", grade="C"))
+                self.assertTrue(delete_student_record(file_path, "2"))
+            self.assertEqual(os.stat(file_path).st_mode & 0o777, 0o640)
+            self.assertEqual(search_student(file_path, "student_id", "2"), None)
+
+    def test_concurrent_array_updates_are_not_lost(self):
+        file_path = os.path.join(self.temp_dir.name, "students.json")
+        add_student_records(
+            file_path,
+            ({"student_id": str(number), "name": f"S{number}", "age": 0, "grade": "A"} for number in range(8)),
+        )
+
+        def worker(number):
+            for age in range(1, 26):
+                update_student_record(file_path, str(number), age=age)
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([record["age"] for record in iter_student_records(file_path)], [25] * 8)
+        self.assertFalse([name for name in os.listdir(self.temp_dir.name) if name.endswith(".tmp")])
+
+    def test_concurrent_log_updates_are_not_lost(self):
+        file_path = os.path.join(self.temp_dir.name, "students.jsonl")
+        add_student_record(file_path, "1", "Ann Lee", 18, "A")
+
+        def worker(number):
+            for value in range(1, 26):
+                update_student_record(file_path, "1", **{f"field{number}": value})
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        records = list(iter_student_records(file_path))
+        self.assertEqual(len(records), 1)
+        self.assertEqual([records[0].get(f"field{number}") for number in range(8)], [25] * 8)
+        self.assertTrue(delete_student_record(file_path, "1"))
+        self.assertFalse(delete_student_record(file_path, "1"))
+        self.assertFalse(update_student_record(file_path, "1", age=19))
+        self.assertEqual(list(iter_student_records(file_path)), [])
+
+
 if __name__ == "__main__":
     file_path = "student_records.json"
     add_student_record(file_path, "1232", "Aavash Bhattarai ", 30, "A")
@@ -64,4 +1525,4 @@ if __name__ == "__main__":
             f"Student with ID {student_id} found. Age: {search_result['age']}, Grade: {search_result['grade']}"
         )
     else:
-        print(f"Student with ID {student_id} not found.")
\ No newline at end of file
+        print(f"Student with ID {student_id} not found.")
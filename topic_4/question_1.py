@@ -1,5 +1,119 @@
+import hashlib
+import itertools
+import math
+import mmap
+import os
 import re
+import sqlite3
+import struct
+import tempfile
 import unittest
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Allowed characters of the part before the last @ and of a domain
+LOCAL_PART_PATTERN = r'[a-zA-Z0-9._%+-]+'
+DOMAIN_PATTERN = r'[a-zA-Z0-9.-]+\.[a-zA-Z]+'
+
+# Accepted providers: domains matched exactly, and suffixes matching any subdomain
+DEFAULT_PROVIDERS = ('yahoo.com', 'gmail.com', 'outlook.com')
+DEFAULT_PROVIDER_SUFFIXES = ('.yahoo.com', '.gmail.com', '.outlook.com')
+
+# Bloom filter file: magic, block count, hash count, capacity, then the blocks
+BLOOM_MAGIC = b'EMLBLM01'
+BLOOM_HEADER = struct.Struct('<8sQQQ')
+BLOOM_BLOCK_BYTES = 64
+BLOOM_MAX_HASHES = 21
+
+
+class EmailValidator:
+    """
+    Validates email addresses against a configurable set of providers.
+
+    An address is split on its last @. The domain is checked first, against
+    the exact providers and then the provider suffixes, and its verdict is
+    memoized, since real address lists share a handful of domains. The local
+    part is only matched for addresses whose domain is accepted.
+    """
+
+    def __init__(self, providers=DEFAULT_PROVIDERS, suffixes=DEFAULT_PROVIDER_SUFFIXES, cache_size=65536):
+        """
+        Args:
+            providers (Iterable[str]): Domains accepted as they are, e.g. 'gmail.com'.
+            suffixes (Iterable[str]): Domain suffixes accepted for any subdomain, e.g. '.gmail.com'.
+            cache_size (int): The number of domain verdicts to memoize.
+        """
+        self.providers = frozenset(provider.lower() for provider in providers)
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes)
+        self.cache_size = cache_size
+        self._local_part_match = re.compile(LOCAL_PART_PATTERN).fullmatch
+        self._domain_regex = re.compile(DOMAIN_PATTERN)
+        self._domain_reasons = {}
+        # The number of addresses whose domain verdict was not cached
+        self.misses = 0
+
+    def __reduce__(self):
+        # Sent to worker processes by configuration; each builds its own cache.
+        return EmailValidator, (self.providers, self.suffixes, self.cache_size)
+
+    def check(self, email):
+        """
+        Validates an email address and tells why it is invalid.
+
+        Args:
+            email (str): The email address to be validated.
+
+        Returns:
+            str: None if the email is valid, otherwise 'missing @', 'invalid format' or 'unsupported provider'.
+        """
+        local_part, at, domain = email.rpartition('@')
+        if not at:
+            return 'missing @'
+        try:
+            reason = self._domain_reasons[domain]
+        except KeyError:
+            reason = self._remember_domain(domain)
+        if reason is None and not self._local_part_match(local_part):
+            return 'invalid format'
+        return reason
+
+    def is_valid(self, email):
+        """
+        Validates an email address.
+
+        Args:
+            email (str): The email address to be validated.
+
+        Returns:
+            bool: True if the email is valid, False otherwise.
+        """
+        return self.check(email) is None
+
+    def _remember_domain(self, domain):
+        """Check a domain not in the verdict cache and add its verdict."""
+        self.misses += 1
+        if len(self._domain_reasons) >= self.cache_size:
+            # Mostly garbage domains; the common ones are back after a few addresses
+            self._domain_reasons.clear()
+        reason = self._domain_reasons[domain] = self._check_domain(domain)
+        return reason
+
+    def _check_domain(self, domain):
+        """Get the reason a domain is rejected, or None if it is accepted."""
+        if not self._domain_regex.fullmatch(domain):
+            return 'invalid format'
+        domain = domain.lower()
+        if domain in self.providers:
+            return None
+        for suffix in self.suffixes:
+            # The suffix must follow at least one character of subdomain
+            if len(domain) > len(suffix) and domain.endswith(suffix):
+                return None
+        return 'unsupported provider'
+
+
+_validator = EmailValidator()
+
 
 def validate_email(email):
     """
@@ -11,15 +125,237 @@ def validate_email(email):
     Returns:
         bool: True if the email is valid, False otherwise.
     """
-    # Regular expression to validate email format
-    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.(yahoo|gmail|outlook)\.com$'
-    
-    # Check for valid format and valid email providers
-    if re.match(email_regex, email):
-        return True
-    else:
+    return _validator.check(email) is None
+
+
+def _check_chunk(emails, validator=None):
+    """Check a chunk of addresses, with the process's validator unless one is given."""
+    check = (validator or _validator).check
+    results = []
+    for email in emails:
+        reason = check(email)
+        results.append((email, reason is None, reason))
+    return results
+
+
+def _init_worker(validator):
+    """Install the validator of the batch in a new worker process."""
+    global _validator
+    _validator = validator
+
+
+def _read_lines(path):
+    """Yield the lines of a file without their line endings."""
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        for line in file:
+            yield line.rstrip('\r\n')
+
+
+def _chunks(emails, chunk_size):
+    """Split an iterable of addresses into lists of at most chunk_size."""
+    emails = iter(emails)
+    while True:
+        chunk = list(itertools.islice(emails, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_emails(emails, workers=None, chunk_size=10000, validator=None):
+    """
+    Validates many email addresses across a pool of worker processes.
+
+    The input is read lazily in chunks, and only a few chunks per worker are
+    in flight at a time, so files of any size are validated in constant memory.
+
+    Args:
+        emails (Iterable[str] | str): The addresses to validate, or the path of a file with one address per line.
+        workers (int): The number of worker processes; None uses one per CPU, 1 validates in this process.
+        chunk_size (int): The number of addresses sent to a worker at a time.
+        validator (EmailValidator): The provider rules to apply; None uses the default providers.
+
+    Yields:
+        tuple: (email, valid, reason) for each address, in input order. reason is None for valid addresses.
+    """
+    if isinstance(emails, str):
+        emails = _read_lines(emails)
+    chunks = _chunks(emails, chunk_size)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunks:
+            yield from _check_chunk(chunk, validator)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(validator or _validator,),
+    ) as executor:
+        max_pending = 2 * workers
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_check_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def normalize_email(email):
+    """
+    Normalizes an email address for de-duplication.
+
+    Args:
+        email (str): The email address.
+
+    Returns:
+        str: The address in lower case.
+    """
+    return email.lower()
+
+
+class BloomFilter:
+    """
+    A blocked Bloom filter kept in a memory-mapped file, so it survives restarts.
+
+    Every key sets its bits inside one 512-bit block, so adding or checking
+    a key reads and writes a single block instead of one byte per hash.
+    Confining the bits to a block raises the false positive rate, which is
+    made up for with 20% more bits than a plain filter would use. The
+    filter is sized for ``capacity`` keys at ``error_rate`` false positives.
+    An existing file is reopened with the size it was created with,
+    whatever the arguments.
+    """
+
+    def __init__(self, path, capacity=10_000_000, error_rate=0.001):
+        """
+        Args:
+            path (str): The file holding the filter.
+            capacity (int): The number of keys the filter is sized for.
+            error_rate (float): The false positive rate at capacity.
+        """
+        if not os.path.exists(path):
+            bit_count = -capacity * math.log(error_rate) / math.log(2) ** 2
+            hash_count = min(BLOOM_MAX_HASHES, max(1, round(bit_count / capacity * math.log(2))))
+            block_count = max(1, math.ceil(bit_count * 1.2 / (BLOOM_BLOCK_BYTES * 8)))
+            with open(path, 'wb') as file:
+                file.write(BLOOM_HEADER.pack(BLOOM_MAGIC, block_count, hash_count, capacity))
+                file.truncate(BLOOM_HEADER.size + block_count * BLOOM_BLOCK_BYTES)
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self.block_count, self.hash_count, self.capacity = BLOOM_HEADER.unpack_from(self._map)
+        if magic != BLOOM_MAGIC:
+            self.close()
+            raise ValueError(f'Not a Bloom filter file: {path}')
+
+    def _locate(self, key):
+        """Get the file offset of a key's block and the mask of its bits in the block."""
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=32).digest(), 'little')
+        offset = BLOOM_HEADER.size + (digest % self.block_count) * BLOOM_BLOCK_BYTES
+        # The remaining 192 bits give up to BLOOM_MAX_HASHES 9-bit positions
+        digest >>= 64
+        mask = 0
+        for _ in range(self.hash_count):
+            mask |= 1 << (digest & 511)
+            digest >>= 9
+        return offset, mask
+
+    def __contains__(self, key):
+        offset, mask = self._locate(key)
+        block = int.from_bytes(self._map[offset : offset + BLOOM_BLOCK_BYTES], 'little')
+        return block & mask == mask
+
+    def add(self, key):
+        """
+        Adds a key to the filter.
+
+        Args:
+            key (str): The key to add.
+
+        Returns:
+            bool: True if the key may have been added before, False if it certainly was not.
+        """
+        offset, mask = self._locate(key)
+        block = int.from_bytes(self._map[offset : offset + BLOOM_BLOCK_BYTES], 'little')
+        if block & mask == mask:
+            return True
+        self._map[offset : offset + BLOOM_BLOCK_BYTES] = (block | mask).to_bytes(BLOOM_BLOCK_BYTES, 'little')
         return False
 
+    def flush(self):
+        """Writes the filter to disk."""
+        self._map.flush()
+
+    def close(self):
+        """Writes the filter to disk and closes its file."""
+        self._map.close()
+        self._file.close()
+
+
+def validate_unique_emails(emails, state_dir, capacity=10_000_000, error_rate=0.001, chunk_size=10000, validator=None):
+    """
+    Validates the addresses not seen before, dropping repeats across runs.
+
+    Each normalized address is first checked against a Bloom filter. Only
+    addresses the filter may have seen are confirmed against an exact set
+    of seen addresses in SQLite, so memory stays at the filter's size. The
+    filter and the set are kept in state_dir. An address is added to them
+    only once its result was yielded, at the end of each chunk or when the
+    generator is closed, so a later run with the same state_dir resumes
+    where this one stopped and an address is never lost, though a run that
+    crashes may deliver the rest of its last chunk again.
+
+    Args:
+        emails (Iterable[str] | str): The addresses, or the path of a file with one address per line.
+        state_dir (str): The directory holding the filter and the seen set.
+        capacity (int): The number of distinct addresses the filter is sized for.
+        error_rate (float): The false positive rate of the filter at capacity.
+        chunk_size (int): The number of addresses committed to the seen set at a time.
+        validator (EmailValidator): The provider rules to apply; None uses the default providers.
+
+    Yields:
+        tuple: (email, valid, reason) for each first-seen address, in input order.
+    """
+    if isinstance(emails, str):
+        emails = _read_lines(emails)
+    os.makedirs(state_dir, exist_ok=True)
+    check = (validator or _validator).check
+    bloom = BloomFilter(os.path.join(state_dir, 'seen.bloom'), capacity, error_rate)
+    connection = sqlite3.connect(os.path.join(state_dir, 'seen.db'))
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS seen (address TEXT PRIMARY KEY) WITHOUT ROWID')
+        for chunk in _chunks(emails, chunk_size):
+            new = set()
+            keys = []
+            results = []
+            for email in chunk:
+                key = normalize_email(email)
+                if key in new:
+                    continue
+                if bloom.add(key) and connection.execute(
+                    'SELECT 1 FROM seen WHERE address = ?', (key,)
+                ).fetchone():
+                    continue
+                new.add(key)
+                keys.append(key)
+                reason = check(email)
+                results.append((email, reason is None, reason))
+            delivered = 0
+            try:
+                for result in results:
+                    delivered += 1
+                    yield result
+            finally:
+                # The filter must never miss an address already in the seen set
+                bloom.flush()
+                with connection:
+                    connection.executemany('INSERT OR IGNORE INTO seen VALUES (?)', ((key,) for key in keys[:delivered]))
+    finally:
+        connection.close()
+        bloom.close()
+
 class TestEmailValidation(unittest.TestCase):
 
     def test_valid_emails(self):
@@ -35,5 +371,46 @@ class TestEmailValidation(unittest.TestCase):
         self.assertFalse(validate_email('test@gmail.com '))
         self.assertFalse(validate_email('john.doe@gmail'))
 
+    def test_provider_rules(self):
+        """Test exact and suffix provider rules of a configured validator."""
+        validator = EmailValidator(providers=['example.org'], suffixes=['.corp.example.org'])
+        self.assertTrue(validator.is_valid('first.last@example.org'))
+        self.assertTrue(validator.is_valid('first.last@mail.corp.example.org'))
+        self.assertFalse(validator.is_valid('first.last@corp.example.org'))
+        self.assertFalse(validator.is_valid('first.last@gmail.com'))
+        self.assertEqual(validator.check('bad local@example.org'), 'invalid format')
+        self.assertEqual(validator.check('user@example@example.org'), 'invalid format')
+
+    def test_validate_unique_emails_resumes(self):
+        """Test repeats are dropped within a run and across runs sharing a state directory."""
+        with tempfile.TemporaryDirectory() as state_dir:
+            first = list(validate_unique_emails(
+                ['a@gmail.com', 'A@GMAIL.com', 'b@yopmail.com', 'a@gmail.com'], state_dir, capacity=100, chunk_size=2
+            ))
+            self.assertEqual(first, [('a@gmail.com', True, None), ('b@yopmail.com', False, 'unsupported provider')])
+            second = list(validate_unique_emails(['b@yopmail.com', 'c@yahoo.com'], state_dir))
+            self.assertEqual(second, [('c@yahoo.com', True, None)])
+
+    def test_validate_unique_emails_keeps_undelivered_addresses(self):
+        """Test addresses not yet yielded when the generator is closed are delivered by the next run."""
+        emails = ['a@gmail.com', 'b@gmail.com', 'c@gmail.com']
+        with tempfile.TemporaryDirectory() as state_dir:
+            results = validate_unique_emails(emails, state_dir, capacity=100)
+            self.assertEqual(next(results), ('a@gmail.com', True, None))
+            results.close()
+            resumed = list(validate_unique_emails(emails, state_dir, capacity=100))
+            self.assertEqual(resumed, [('b@gmail.com', True, None), ('c@gmail.com', True, None)])
+
+    def test_validate_emails_keeps_order(self):
+        """Test batch validation gives per-address verdicts in input order."""
+        emails = ['invalid.email.com', 'user@yopmail.com', 'test@gmail.com '] * 5
+        for workers in (1, 2):
+            results = list(validate_emails(emails, workers=workers, chunk_size=2))
+            self.assertEqual([email for email, _, _ in results], emails)
+            self.assertEqual(
+                [(valid, reason) for _, valid, reason in results[:3]],
+                [(False, 'missing @'), (False, 'unsupported provider'), (False, 'invalid format')],
+            )
+
 if __name__ == '__main__':
     unittest.main()
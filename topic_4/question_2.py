@@ -1,32 +1,594 @@
+import heapq
+import math
+import os
+import tempfile
+import time
 import unittest
-import statistics
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-from typing import List
+from typing import Iterable, Iterator, List
 
-def calculate_statistics(data: List[float]) -> dict:
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed by calculate_file_statistics
+    np = None
+
+# Values read from the memory map at a time by a worker
+FILE_BLOCK_VALUES = 1 << 22
+
+
+class _P2Median:
+    """
+    Estimates the median of a stream in constant memory with the P² algorithm
+    (Jain and Chlamtac), keeping five markers whose heights are adjusted
+    with piecewise-parabolic interpolation as values arrive.
+    """
+
+    increments = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+    def __init__(self, sorted_values: List[float]) -> None:
+        """
+        Start from the sorted values seen so far, at least five of them.
+
+        Args:
+            sorted_values (list[float]): The values seen so far, in ascending order.
+        """
+        count = len(sorted_values)
+        self.positions = [1, 0, 0, 0, count]
+        for i in (1, 2, 3):
+            # Marker positions must stay strictly increasing
+            desired = 1 + (count - 1) * self.increments[i]
+            self.positions[i] = min(max(round(desired), self.positions[i - 1] + 1), count - 3 + i)
+        self.heights = [sorted_values[position - 1] for position in self.positions]
+
+    def add(self, value: float) -> None:
+        """Add a value and move the markers towards their desired positions."""
+        heights = self.heights
+        positions = self.positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+
+        # The last marker's position is the count, which fixes the desired positions
+        last = positions[4] - 1
+        for i in (1, 2, 3):
+            offset = 1 + last * self.increments[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (
+                offset <= -1 and positions[i - 1] - positions[i] < -1
+            ):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (
+                        positions[i + step] - positions[i]
+                    )
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        """Get the piecewise-parabolic prediction of marker i moved by step."""
+        heights = self.heights
+        positions = self.positions
+        return heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+            (positions[i] - positions[i - 1] + step)
+            * (heights[i + 1] - heights[i])
+            / (positions[i + 1] - positions[i])
+            + (positions[i + 1] - positions[i] - step)
+            * (heights[i] - heights[i - 1])
+            / (positions[i] - positions[i - 1])
+        )
+
+    @property
+    def median(self) -> float:
+        """The estimated median."""
+        return self.heights[2]
+
+
+class OnlineStatistics:
+    """
+    Accumulates mean, median and standard deviation of a stream in one pass.
+
+    Mean and variance use Welford's algorithm. The median is exact, kept
+    with two heaps around the middle of the values, until more than
+    max_exact_values values have been seen. From then on it is estimated
+    with P² in constant memory.
+    """
+
+    def __init__(self, max_exact_values: int = None) -> None:
+        """
+        Args:
+            max_exact_values (int): The number of values kept for an exact median, or None for no limit.
+        """
+        self.max_exact_values = max_exact_values
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        # Max-heap (negated) of the lower half and min-heap of the upper half
+        self._lower = []
+        self._upper = []
+        self._estimator = None
+
+    def add(self, value: float) -> None:
+        """
+        Add one value.
+
+        Args:
+            value (float): The value to be added.
+
+        Returns:
+            None
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if self._estimator is not None:
+            self._estimator.add(value)
+            return
+        if self._lower and value > -self._lower[0]:
+            heapq.heappush(self._upper, value)
+            if len(self._upper) > len(self._lower):
+                heapq.heappush(self._lower, -heapq.heappop(self._upper))
+        else:
+            heapq.heappush(self._lower, -value)
+            if len(self._lower) > len(self._upper) + 1:
+                heapq.heappush(self._upper, -heapq.heappop(self._lower))
+        if self.max_exact_values is not None and self.count > max(self.max_exact_values, 4):
+            self._start_estimating()
+
+    def update(self, values: Iterable[float]) -> None:
+        """
+        Add every value of an iterable.
+
+        Args:
+            values (Iterable[float]): The values to be added.
+
+        Returns:
+            None
+        """
+        add = self.add
+        for value in values:
+            add(value)
+
+    def _start_estimating(self) -> None:
+        """Replace the heaps with a P² estimator seeded from their values."""
+        sorted_values = sorted(-value for value in self._lower) + sorted(self._upper)
+        self._estimator = _P2Median(sorted_values)
+        self._lower = []
+        self._upper = []
+
+    @property
+    def exact(self) -> bool:
+        """Whether the median is exact."""
+        return self._estimator is None
+
+    @property
+    def median(self) -> float:
+        """The median of the values, estimated once the exact limit was passed."""
+        if not self.count:
+            raise ValueError("No values added")
+        if self._estimator is not None:
+            return self._estimator.median
+        if len(self._lower) > len(self._upper):
+            return -self._lower[0]
+        return (-self._lower[0] + self._upper[0]) / 2
+
+    @property
+    def variance(self) -> float:
+        """The sample variance of the values, 0 for fewer than two values."""
+        if self.count < 2:
+            return 0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std_dev(self) -> float:
+        """The sample standard deviation of the values, 0 for fewer than two values."""
+        return math.sqrt(self.variance)
+
+    def result(self) -> dict:
+        """
+        Get the statistics in the form returned by calculate_statistics.
+
+        Returns:
+            dict: A dictionary containing calculated mean, median, and standard deviation.
+        """
+        if not self.count:
+            raise ValueError("Input data cannot be empty")
+        return {"mean": self.mean, "median": self.median, "std_dev": self.std_dev}
+
+
+def iter_values(file_path: str) -> Iterator[float]:
+    """
+    Read numbers from a text file, separated by whitespace or newlines.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Yields:
+        float: Each number in the file.
+    """
+    with open(file_path, "r") as file:
+        for line in file:
+            for token in line.split():
+                yield float(token)
+
+
+def calculate_statistics(data: Iterable[float], max_exact_values: int = None) -> dict:
     """
     Calculate mean, median, and standard deviation of numerical data.
 
+    The data is read in a single pass, so any iterable works, including
+    one reading values from a file with iter_values.
+
     Args:
-        data (list[float]): List of numerical data.
+        data (Iterable[float]): Numerical data.
+        max_exact_values (int): Estimate the median with P² beyond this many values, or None to keep it exact.
 
     Returns:
         dict: A dictionary containing calculated mean, median, and standard deviation.
     """
-    if not data:
-        raise ValueError("Input data cannot be empty")
+    accumulator = OnlineStatistics(max_exact_values)
+    accumulator.update(data)
+    return accumulator.result()
+
+
+class RollingStatistics:
+    """
+    Tracks mean, median and standard deviation over a sliding window of samples.
+
+    The window holds either the last window_size samples or the samples of
+    the last window_seconds. Mean and variance are updated by adding and
+    removing samples with Welford's formulas, and recomputed from the window
+    once per window length of removals so rounding errors cannot build up.
+    The median is kept with two heaps around the middle of the window;
+    removed samples stay in the heaps, marked in a per-heap count, until
+    they reach a top, so every update is O(log N) amortized.
+    """
+
+    def __init__(self, window_size: int = None, window_seconds: float = None) -> None:
+        """
+        Args:
+            window_size (int): The number of most recent samples in the window.
+            window_seconds (float): The age in seconds of the oldest sample kept in the window.
+        """
+        if (window_size is None) == (window_seconds is None):
+            raise ValueError("Give exactly one of window_size and window_seconds")
+        if window_size is not None and window_size < 1:
+            raise ValueError("window_size must be at least 1")
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        # (timestamp, value) pairs, oldest first
+        self._samples = deque()
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._removals = 0
+        # Max-heap (negated) of the lower half and min-heap of the upper half
+        self._lower = []
+        self._upper = []
+        self._lower_size = 0
+        self._upper_size = 0
+        # Removed values still in each heap, by value
+        self._lower_removed = {}
+        self._upper_removed = {}
+
+    def __len__(self) -> int:
+        return len(self._samples)
 
-    mean = sum(data) / len(data)
-    median = statistics.median(data)
+    def add(self, value: float, timestamp: float = None) -> None:
+        """
+        Add a sample and drop the samples that fall out of the window.
 
-    # Calculate standard deviation only if there are at least two data points
-    if len(data) >= 2:
-        std_dev = statistics.stdev(data)
+        Args:
+            value (float): The sample value.
+            timestamp (float): The time of the sample, in non-decreasing order; defaults to time.monotonic().
+
+        Returns:
+            None
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self._samples.append((timestamp, value))
+        count = len(self._samples)
+        delta = value - self.mean
+        self.mean += delta / count
+        self._m2 += delta * (value - self.mean)
+
+        if self._lower and value <= -self._lower[0]:
+            heapq.heappush(self._lower, -value)
+            self._lower_size += 1
+        elif self._lower:
+            heapq.heappush(self._upper, value)
+            self._upper_size += 1
+        else:
+            heapq.heappush(self._lower, -value)
+            self._lower_size += 1
+        self._balance()
+
+        if self.window_size is not None:
+            while len(self._samples) > self.window_size:
+                self._remove_oldest()
+        else:
+            while self._samples[0][0] <= timestamp - self.window_seconds:
+                self._remove_oldest()
+                if not self._samples:
+                    break
+
+    def _remove_oldest(self) -> None:
+        """Remove the oldest sample from the running moments and the heaps."""
+        _, value = self._samples.popleft()
+        count = len(self._samples)
+        if count:
+            delta = value - self.mean
+            self.mean -= delta / count
+            self._m2 -= delta * (value - self.mean)
+        else:
+            self.mean = 0.0
+            self._m2 = 0.0
+
+        if value <= -self._lower[0]:
+            self._lower_removed[value] = self._lower_removed.get(value, 0) + 1
+            self._lower_size -= 1
+        else:
+            self._upper_removed[value] = self._upper_removed.get(value, 0) + 1
+            self._upper_size -= 1
+        self._prune()
+        self._balance()
+
+        self._removals += 1
+        if self._removals >= max(count, 1):
+            self._recompute()
+
+    def _prune(self) -> None:
+        """Pop removed values off the heap tops."""
+        while self._lower and self._lower_removed.get(-self._lower[0]):
+            self._discard(self._lower_removed, -heapq.heappop(self._lower))
+        while self._upper and self._upper_removed.get(self._upper[0]):
+            self._discard(self._upper_removed, heapq.heappop(self._upper))
+
+    @staticmethod
+    def _discard(removed: dict, value: float) -> None:
+        """Count a removed value as gone from its heap."""
+        if removed[value] == 1:
+            del removed[value]
+        else:
+            removed[value] -= 1
+
+    def _balance(self) -> None:
+        """Keep the lower half equal to the upper half or one larger."""
+        if self._lower_size > self._upper_size + 1:
+            heapq.heappush(self._upper, -heapq.heappop(self._lower))
+            self._lower_size -= 1
+            self._upper_size += 1
+            self._prune()
+        elif self._upper_size > self._lower_size:
+            heapq.heappush(self._lower, -heapq.heappop(self._upper))
+            self._upper_size -= 1
+            self._lower_size += 1
+            self._prune()
+
+    def _recompute(self) -> None:
+        """Recompute the moments exactly and drop removed values from the heaps."""
+        self._removals = 0
+        values = [value for _, value in self._samples]
+        self.mean = math.fsum(values) / len(values) if values else 0.0
+        self._m2 = math.fsum((value - self.mean) ** 2 for value in values)
+        self._lower = self._without_removed(self._lower, self._lower_removed, -1)
+        self._upper = self._without_removed(self._upper, self._upper_removed, 1)
+
+    @staticmethod
+    def _without_removed(heap: list, removed: dict, sign: int) -> list:
+        """Get a heap without its removed values, clearing their counts."""
+        kept = []
+        for entry in heap:
+            value = sign * entry
+            if removed.get(value):
+                RollingStatistics._discard(removed, value)
+            else:
+                kept.append(entry)
+        heapq.heapify(kept)
+        return kept
+
+    @property
+    def median(self) -> float:
+        """The median of the window."""
+        if not self._samples:
+            raise ValueError("The window is empty")
+        if self._lower_size > self._upper_size:
+            return -self._lower[0]
+        return (-self._lower[0] + self._upper[0]) / 2
+
+    @property
+    def variance(self) -> float:
+        """The sample variance of the window, 0 for fewer than two samples."""
+        if len(self._samples) < 2:
+            return 0
+        return max(self._m2, 0.0) / (len(self._samples) - 1)
+
+    @property
+    def std_dev(self) -> float:
+        """The sample standard deviation of the window, 0 for fewer than two samples."""
+        return math.sqrt(self.variance)
+
+    def result(self) -> dict:
+        """
+        Get the statistics of the window in the form returned by calculate_statistics.
+
+        Returns:
+            dict: A dictionary containing calculated mean, median, and standard deviation.
+        """
+        if not self._samples:
+            raise ValueError("Input data cannot be empty")
+        return {"mean": self.mean, "median": self.median, "std_dev": self.std_dev}
+
+
+class _KLLSketch:
+    """
+    A mergeable quantile sketch (Karnin, Lang and Liberty) over numpy arrays.
+
+    Level h holds values standing for 2**h inputs each. A level over its
+    capacity is sorted and every other value, from a random start, is
+    promoted to the next level, so the sketch keeps O(size) values for any
+    input while the total weight stays equal to the input count.
+    """
+
+    def __init__(self, size: int = 1000, seed: int = None) -> None:
+        """
+        Args:
+            size (int): The capacity of the top level; larger is more accurate.
+            seed (int): The seed of the random compaction offsets.
+        """
+        self.size = size
+        self.levels = [np.empty(0)]
+        self._random = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        """Get the capacity of a level, shrinking by 2/3 per level below the top."""
+        return max(2, math.ceil(self.size * (2 / 3) ** (len(self.levels) - 1 - level)))
+
+    def extend(self, values) -> None:
+        """Add a numpy array of values."""
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+
+    def merge(self, other: "_KLLSketch") -> None:
+        """Add the values summarized by another sketch."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, values in enumerate(other.levels):
+            self.levels[level] = np.concatenate((self.levels[level], values))
+        self._compress()
+
+    def _compress(self) -> None:
+        """Compact every level over its capacity into the next one."""
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) > self._capacity(level):
+                values = np.sort(values)
+                # With an odd count the largest value stays behind to keep the weight exact
+                kept = values[len(values) - len(values) % 2 :]
+                promoted = values[self._random.integers(2) : len(values) - len(kept) : 2]
+                self.levels[level] = kept
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate((self.levels[level + 1], promoted))
+            level += 1
+
+    def quantile(self, fraction: float) -> float:
+        """Get the estimated value below which the fraction of the inputs lie."""
+        if len(self.levels) == 1:
+            # Nothing was compacted, so the quantile is exact
+            return float(np.quantile(self.levels[0], fraction))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(level_values), 2.0 ** level) for level, level_values in enumerate(self.levels)]
+        )
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, fraction * cumulative[-1], side="left")
+        return float(values[order[min(index, len(values) - 1)]])
+
+
+def _merge_moments(first: tuple, second: tuple) -> tuple:
+    """Merge two (count, mean, M2) partials exactly with Chan's formulas."""
+    count_a, mean_a, m2_a = first
+    count_b, mean_b, m2_b = second
+    count = count_a + count_b
+    if not count:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta * count_b / count
+    m2 = m2_a + m2_b + delta * delta * count_a * count_b / count
+    return count, mean, m2
+
+
+def _shard_statistics(file_path: str, dtype: str, start: int, stop: int, sketch_size: int, seed: int) -> tuple:
+    """Get the (count, mean, M2) partial and the sketch of one shard of a binary file."""
+    # Map only whole values; memmap rejects a file that ends in a partial one.
+    data = np.memmap(file_path, dtype=dtype, mode="r", shape=(stop,))
+    moments = (0, 0.0, 0.0)
+    sketch = _KLLSketch(sketch_size, seed)
+    for block_start in range(start, stop, FILE_BLOCK_VALUES):
+        block = np.asarray(data[block_start : min(stop, block_start + FILE_BLOCK_VALUES)], dtype=np.float64)
+        mean = float(block.mean())
+        m2 = float(np.square(block - mean).sum())
+        moments = _merge_moments(moments, (len(block), mean, m2))
+        sketch.extend(block)
+    del data
+    return moments, sketch
+
+
+def calculate_file_statistics(
+    file_path: str,
+    dtype: str = "float64",
+    workers: int = None,
+    quantiles: Iterable[float] = (),
+    sketch_size: int = 1000,
+) -> dict:
+    """
+    Calculate mean, median, and standard deviation of a binary file of numbers in parallel.
+
+    The file is memory-mapped and split into shards, and worker processes
+    compute a (count, mean, M2) partial and a quantile sketch per shard.
+    The partials are merged exactly with Chan's formulas, so mean and
+    standard deviation are exact; the median and quantiles come from the
+    merged sketch and are exact only while the data fits in it. Trailing
+    bytes that do not make up a whole value, e.g. of a file still being
+    written, are ignored. Requires numpy.
+
+    Args:
+        file_path (str): The path to a file of raw values in native byte order.
+        dtype (str): The numpy dtype of the values.
+        workers (int): The number of worker processes; None uses one per CPU, 1 computes in this process.
+        quantiles (Iterable[float]): Extra quantiles to estimate, as fractions between 0 and 1.
+        sketch_size (int): The size of the quantile sketches; larger is more accurate.
+
+    Returns:
+        dict: A dictionary containing calculated mean, median, and standard deviation,
+        and a "quantiles" dictionary mapping each requested fraction to its value if any were requested.
+    """
+    if np is None:
+        raise ImportError("calculate_file_statistics requires numpy")
+    count = os.path.getsize(file_path) // np.dtype(dtype).itemsize
+    if not count:
+        raise ValueError("Input data cannot be empty")
+
+    workers = workers or os.cpu_count() or 1
+    shard_count = min(count, workers * 4)
+    bounds = [count * shard // shard_count for shard in range(shard_count + 1)]
+    tasks = [(file_path, dtype, bounds[i], bounds[i + 1], sketch_size, i) for i in range(shard_count)]
+    if workers == 1:
+        partials = [_shard_statistics(*task) for task in tasks]
     else:
-        std_dev = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(_shard_statistics, *zip(*tasks)))
 
-    result = {"mean": mean, "median": median, "std_dev": std_dev}
+    moments = (0, 0.0, 0.0)
+    sketch = _KLLSketch(sketch_size)
+    for shard_moments, shard_sketch in partials:
+        moments = _merge_moments(moments, shard_moments)
+        sketch.merge(shard_sketch)
 
+    count, mean, m2 = moments
+    result = {
+        "mean": mean,
+        "median": sketch.quantile(0.5),
+        "std_dev": math.sqrt(m2 / (count - 1)) if count >= 2 else 0,
+    }
+    quantiles = list(quantiles)
+    if quantiles:
+        result["quantiles"] = {fraction: sketch.quantile(fraction) for fraction in quantiles}
     return result
 
 
@@ -55,6 +617,55 @@ class TestStatisticsCalculation(unittest.TestCase):
         self.assertEqual(result["median"], 35)
         self.assertAlmostEqual(result["std_dev"], 15.8113, places=2)
 
+    def test_iterator_input(self):
+        result = calculate_statistics(iter([15, 25, 35, 45, 55]))
+        self.assertEqual(result["mean"], 35)
+        self.assertEqual(result["median"], 35)
+        self.assertAlmostEqual(result["std_dev"], 15.8113, places=2)
+
+    def test_estimated_median(self):
+        data = [(i * 7919) % 10001 for i in range(10001)]
+        result = calculate_statistics(data, max_exact_values=100)
+        self.assertAlmostEqual(result["median"], 5000, delta=100)
+        self.assertAlmostEqual(result["mean"], 5000)
+
+    def test_rolling_window(self):
+        data = [(i * 7919) % 101 for i in range(500)]
+        by_count = RollingStatistics(window_size=25)
+        by_time = RollingStatistics(window_seconds=10)
+        for i, value in enumerate(data):
+            by_count.add(value)
+            by_time.add(value, timestamp=i * 0.5)
+            expected = calculate_statistics(data[max(0, i - 24) : i + 1])
+            self.assertEqual(by_count.median, expected["median"])
+            self.assertAlmostEqual(by_count.mean, expected["mean"])
+            self.assertAlmostEqual(by_count.std_dev, expected["std_dev"])
+            # Samples older than 10 seconds, 20 samples back, leave the time window
+            self.assertEqual(by_time.result()["median"], calculate_statistics(data[max(0, i - 19) : i + 1])["median"])
+
+    @unittest.skipIf(np is None, "requires numpy")
+    def test_file_statistics(self):
+        data = [(i * 7919) % 10001 for i in range(10001)]
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "values.f64")
+            np.asarray(data, dtype=np.float64).tofile(file_path)
+            result = calculate_file_statistics(file_path, workers=2, quantiles=[0.1, 0.9])
+        self.assertAlmostEqual(result["mean"], 5000)
+        self.assertAlmostEqual(result["std_dev"], calculate_statistics(data)["std_dev"])
+        self.assertAlmostEqual(result["median"], 5000, delta=200)
+        self.assertAlmostEqual(result["quantiles"][0.9], 9000, delta=200)
+
+    @unittest.skipIf(np is None, "requires numpy")
+    def test_file_statistics_ignores_partial_last_value(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "values.f64")
+            np.arange(1, 12, dtype=np.float64).tofile(file_path)
+            with open(file_path, "r+b") as file:
+                file.truncate(10 * 8 + 3)
+            result = calculate_file_statistics(file_path, workers=1)
+        self.assertAlmostEqual(result["mean"], 5.5)
+        self.assertAlmostEqual(result["median"], 5.5)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,3 +1,99 @@
+import contextlib
+import heapq
+import io
+import itertools
+import math
+import random
+import threading
+import time
+import unittest
+import weakref
+
+# How long reserved stock is held for a cart, in seconds
+DEFAULT_RESERVATION_TTL = 15 * 60
+# How often the background sweep expires stale reservations, in seconds
+SWEEP_INTERVAL = 1.0
+
+# Tie-breaker for reservations expiring at the same time
+_reservation_ids = itertools.count()
+
+class Reservation:
+    """
+    Represents stock of a product held for a cart until it expires.
+
+    Attributes:
+        product (Product): The reserved product.
+        quantity (int): The reserved quantity.
+        expires_at (float): The time.monotonic() time the reservation expires at.
+        state (str): 'active', 'committed', 'released' or 'expired'.
+    """
+    def __init__(self, product, quantity, expires_at):
+        self.product = product
+        self.quantity = quantity
+        self.expires_at = expires_at
+        self.state = "active"
+
+    @property
+    def active(self):
+        """Whether the reservation still holds stock."""
+        return self.state == "active"
+
+class ReservationSweeper:
+    """
+    Expires stale reservations in a background thread.
+
+    Only products with reservations that have not expired yet are watched,
+    and each one is swept under its own lock, so the sweep never blocks
+    checkouts of other products.
+
+    Methods:
+        watch(product): Sweep a product until its reservations are gone.
+        sweep(): Expire the stale reservations of every watched product now.
+        stop(): Stop the background thread.
+    """
+    def __init__(self, interval=SWEEP_INTERVAL):
+        self.interval = interval
+        self._products = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def watch(self, product):
+        """Sweep a product until its reservations are gone. Called with the product's lock held."""
+        if product in self._products:
+            return
+        with self._lock:
+            self._products.add(product)
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="reservation-sweeper", daemon=True)
+                self._thread.start()
+
+    def sweep(self):
+        """Expire the stale reservations of every watched product now."""
+        with self._lock:
+            products = list(self._products)
+        now = time.monotonic()
+        for product in products:
+            with product._stock_lock:
+                product._expire_reservations(now)
+                if not product._reservations:
+                    # Under the product's lock, so no reservation can be added meanwhile
+                    with self._lock:
+                        self._products.discard(product)
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sweep()
+
+_sweeper = ReservationSweeper()
+
 class Product:
     """
     Represents a product with a name, price, and quantity.
@@ -10,15 +106,59 @@ class Product:
     Methods:
         get_total_price(): Calculate the total price of the product based on its price and quantity.
         update_quantity(new_quantity): Update the quantity of the product, ensuring it's not negative.
+        reserve(quantity, ttl): Hold stock of the product for a while.
+        release(reservation, quantity): Give reserved stock back.
+        get_available_quantity(): Get the quantity that is not reserved.
+
+    Note:
+        Setting price or quantity notifies the carts holding the product, so their totals stay current.
+        Each product has its own lock over its stock, reservations and carts.
     """
     def __init__(self, name, price, quantity):
         self.name = name
-        self.price = price
-        self.quantity = quantity
+        self._price = price
+        self._quantity = quantity
+        # Carts holding this product, told about price and quantity changes
+        self._carts = weakref.WeakSet()
+        self._stock_lock = threading.RLock()
+        self._reserved = 0
+        # Heap of (expires_at, id, reservation) of reservations not yet expired
+        self._reservations = []
+        # Entries of the heap whose reservation was committed or released
+        self._settled = 0
+
+    @property
+    def price(self):
+        """The price of the product."""
+        return self._price
+
+    @price.setter
+    def price(self, new_price):
+        self._change(new_price, self._quantity)
+
+    @property
+    def quantity(self):
+        """The quantity of the product."""
+        return self._quantity
+
+    @quantity.setter
+    def quantity(self, new_quantity):
+        self._change(self._price, new_quantity)
+
+    def _change(self, new_price, new_quantity):
+        """Set the price and quantity and notify the carts if the total price changed."""
+        with self._stock_lock:
+            old_total = self.get_total_price()
+            self._price = new_price
+            self._quantity = new_quantity
+            new_total = self.get_total_price()
+            if new_total != old_total:
+                for cart in list(self._carts):
+                    cart._product_changed(self, old_total, new_total)
 
     def get_total_price(self):
         """Calculate the total price of the product."""
-        return self.price * self.quantity
+        return self._price * self._quantity
 
     def update_quantity(self, new_quantity):
         """
@@ -35,6 +175,74 @@ class Product:
         else:
             print("Invalid quantity value. Quantity cannot be negative.")
 
+    def get_available_quantity(self):
+        """Get the quantity of the product that is not reserved."""
+        with self._stock_lock:
+            self._expire_reservations(time.monotonic())
+            return self._quantity - self._reserved
+
+    def reserve(self, quantity, ttl=DEFAULT_RESERVATION_TTL):
+        """
+        Hold stock of the product until it is committed, released or expires.
+
+        Args:
+            quantity (int): The quantity to hold.
+            ttl (float): The number of seconds before the reservation expires.
+
+        Returns:
+            Reservation: The reservation, or None if not enough stock is available.
+        """
+        with self._stock_lock:
+            now = time.monotonic()
+            self._expire_reservations(now)
+            if self._quantity - self._reserved < quantity:
+                return None
+            reservation = Reservation(self, quantity, now + ttl)
+            self._reserved += quantity
+            heapq.heappush(self._reservations, (reservation.expires_at, next(_reservation_ids), reservation))
+            _sweeper.watch(self)
+            return reservation
+
+    def release(self, reservation, quantity=None):
+        """
+        Give reserved stock back before the reservation expires.
+
+        Args:
+            reservation (Reservation): A reservation of this product.
+            quantity (int): The quantity to give back, or None for all of it.
+        """
+        with self._stock_lock:
+            if not reservation.active:
+                return
+            if quantity is None or quantity >= reservation.quantity:
+                quantity = reservation.quantity
+                reservation.state = "released"
+            reservation.quantity -= quantity
+            self._reserved -= quantity
+            if not reservation.active:
+                self._settle(1)
+
+    def _settle(self, count):
+        """
+        Count heap entries whose reservation was committed or released, and
+        drop them once they make up most of the heap. Called with the product's lock held.
+        """
+        self._settled += count
+        if self._settled * 2 > len(self._reservations):
+            self._reservations = [entry for entry in self._reservations if entry[2].active]
+            heapq.heapify(self._reservations)
+            self._settled = 0
+
+    def _expire_reservations(self, now):
+        """Expire the reservations past their time. Called with the product's lock held."""
+        while self._reservations and self._reservations[0][0] <= now:
+            _, _, reservation = heapq.heappop(self._reservations)
+            if reservation.active:
+                reservation.state = "expired"
+                self._reserved -= reservation.quantity
+            else:
+                self._settled -= 1
+
 class ShoppingCart:
     """
     Represents a shopping cart containing products and their quantities.
@@ -44,11 +252,38 @@ class ShoppingCart:
 
     Methods:
         add_product(product, quantity): Add a product with a given quantity to the cart.
+        reserve_product(product, quantity, ttl): Reserve stock of a product and add it to the cart.
         remove_product(product, quantity): Remove a certain quantity of a product from the cart.
-        get_total_cart_price(): Calculate the total price of all products in the cart.
+        clear(): Remove every product from the cart and release its reservations.
+        commit(): Take the products of the cart out of stock, all of them or none.
+        get_total_cart_price(): Get the total price of all products in the cart.
+        recompute_total_cart_price(): Calculate the total price from every line of the cart.
+        is_total_consistent(): Check the running total against a full recomputation.
+
+    Note:
+        The total is kept up to date as lines are added and removed and as the
+        products change, so reading it does not depend on the size of the cart.
+        Change the cart through its methods or by assigning products, not by
+        editing the products dictionary in place.
     """
     def __init__(self):
-        self.products = {}
+        self._products = {}
+        self._total_price = 0
+        # Reservations held for each product, oldest first
+        self._reservations = {}
+        # Guards the total, which products update from other threads
+        self._lock = threading.Lock()
+
+    @property
+    def products(self):
+        """The products in the cart and their quantities."""
+        return self._products
+
+    @products.setter
+    def products(self, new_products):
+        self.clear()
+        for product, quantity in new_products.items():
+            self.add_product(product, quantity)
 
     def add_product(self, product, quantity):
         """
@@ -62,13 +297,39 @@ class ShoppingCart:
             Negative values for quantity are not allowed.
         """
         if quantity >= 0:
-            if product in self.products:
-                self.products[product] += quantity
-            else:
-                self.products[product] = quantity
+            with product._stock_lock, self._lock:
+                if product in self._products:
+                    self._products[product] += quantity
+                else:
+                    self._products[product] = quantity
+                    product._carts.add(self)
+                self._total_price += product.get_total_price() * quantity
         else:
             print("Invalid quantity value. Quantity cannot be negative.")
 
+    def reserve_product(self, product, quantity, ttl=DEFAULT_RESERVATION_TTL):
+        """
+        Reserve stock of a product and add it to the cart.
+
+        Args:
+            product (Product): The product to be added to the cart.
+            quantity (int): The quantity of the product to be reserved and added.
+            ttl (float): The number of seconds the stock is held for.
+
+        Returns:
+            bool: True if the stock was reserved, False otherwise.
+        """
+        if quantity < 0:
+            print("Invalid quantity value. Quantity cannot be negative.")
+            return False
+        reservation = product.reserve(quantity, ttl)
+        if reservation is None:
+            print(f"Not enough {product.name} in stock.")
+            return False
+        self.add_product(product, quantity)
+        self._reservations.setdefault(product, []).append(reservation)
+        return True
+
     def remove_product(self, product, quantity):
         """
         Remove a certain quantity of a product from the cart.
@@ -80,24 +341,119 @@ class ShoppingCart:
         Note:
             Negative values for quantity are not allowed.
         """
-        if product in self.products:
+        if product in self._products:
             if quantity >= 0:
-                if self.products[product] <= quantity:
-                    del self.products[product]
-                else:
-                    self.products[product] -= quantity
+                with product._stock_lock, self._lock:
+                    if self._products[product] <= quantity:
+                        self._total_price -= product.get_total_price() * self._products[product]
+                        del self._products[product]
+                        product._carts.discard(self)
+                        if not self._products:
+                            # Drop rounding left over from the running float total
+                            self._total_price = 0
+                    else:
+                        self._products[product] -= quantity
+                        self._total_price -= product.get_total_price() * quantity
+                self._release_excess(product)
             else:
                 print("Invalid quantity value. Quantity cannot be negative.")
         else:
             print("Product not found in the cart.")
 
+    def _release_excess(self, product):
+        """Release reserved stock of a product beyond its quantity in the cart, newest first."""
+        reservations = self._reservations.get(product)
+        if not reservations:
+            return
+        excess = sum(reservation.quantity for reservation in reservations if reservation.active)
+        excess -= self._products.get(product, 0)
+        while excess > 0 and reservations:
+            reservation = reservations[-1]
+            released = min(excess, reservation.quantity) if reservation.active else 0
+            product.release(reservation, released)
+            excess -= released
+            if not reservation.active:
+                reservations.pop()
+        if not reservations:
+            del self._reservations[product]
+
+    def clear(self):
+        """Remove every product from the cart and release its reservations."""
+        for product, reservations in self._reservations.items():
+            for reservation in reservations:
+                product.release(reservation)
+        self._reservations = {}
+        for product in list(self._products):
+            with product._stock_lock:
+                product._carts.discard(self)
+        with self._lock:
+            self._products = {}
+            self._total_price = 0
+
+    def commit(self):
+        """
+        Take the products of the cart out of stock, all of them or none.
+
+        The locks of the products are taken in a fixed order, so concurrent
+        checkouts sharing products cannot deadlock. Reserved quantities are
+        used first; the rest, including quantities whose reservation expired,
+        must still be available.
+
+        Returns:
+            bool: True if every line was taken out of stock, False if nothing was.
+        """
+        lines = sorted(self._products.items(), key=lambda line: id(line[0]))
+        with contextlib.ExitStack() as stack:
+            for product, _ in lines:
+                stack.enter_context(product._stock_lock)
+            now = time.monotonic()
+            held = {}
+            for product, quantity in lines:
+                product._expire_reservations(now)
+                held[product] = sum(
+                    reservation.quantity for reservation in self._reservations.get(product, ()) if reservation.active
+                )
+                if product._quantity - product._reserved < quantity - held[product]:
+                    return False
+            for product, quantity in lines:
+                committed = 0
+                for reservation in self._reservations.get(product, ()):
+                    if reservation.active:
+                        reservation.state = "committed"
+                        committed += 1
+                product._reserved -= held[product]
+                product._settle(committed)
+                product._change(product._price, product._quantity - quantity)
+        return True
+
+    def _product_changed(self, product, old_total, new_total):
+        """Update the running total for a product whose total price changed."""
+        with self._lock:
+            self._total_price += (new_total - old_total) * self._products[product]
+
     def get_total_cart_price(self):
-        """Calculate the total price of all products in the cart."""
+        """Get the total price of all products in the cart."""
+        return self._total_price
+
+    def recompute_total_cart_price(self):
+        """Calculate the total price of all products in the cart from every line."""
         total_price = 0
-        for product, quantity in self.products.items():
+        for product, quantity in self._products.items():
             total_price += product.get_total_price() * quantity
         return total_price
 
+    def is_total_consistent(self, rel_tol=1e-9):
+        """
+        Check the running total against a full recomputation.
+
+        Args:
+            rel_tol (float): The relative difference allowed for rounding of float prices.
+
+        Returns:
+            bool: True if the totals match.
+        """
+        return math.isclose(self._total_price, self.recompute_total_cart_price(), rel_tol=rel_tol, abs_tol=1e-9)
+
 class Customer:
     """
     Represents a customer with a name, email, and a shopping cart.
@@ -109,6 +465,7 @@ class Customer:
 
     Methods:
         add_to_cart(product, quantity): Add a product with a certain quantity to the customer's cart.
+        reserve(product, quantity, ttl): Reserve stock of a product and add it to the customer's cart.
         remove_from_cart(product, quantity): Remove a certain quantity of a product from the customer's cart.
         checkout(): Proceed to checkout the items in the customer's cart.
     """
@@ -121,18 +478,32 @@ class Customer:
         """Add a product with a certain quantity to the customer's cart."""
         self.shopping_cart.add_product(product, quantity)
 
+    def reserve(self, product, quantity, ttl=DEFAULT_RESERVATION_TTL):
+        """Reserve stock of a product and add it to the customer's cart."""
+        return self.shopping_cart.reserve_product(product, quantity, ttl)
+
     def remove_from_cart(self, product, quantity):
         """Remove a certain quantity of a product from the customer's cart."""
         self.shopping_cart.remove_product(product, quantity)
 
     def checkout(self):
-        """Proceed to checkout the items in the customer's cart."""
+        """
+        Proceed to checkout the items in the customer's cart.
+
+        Returns:
+            bool: True if the items were taken out of stock, False otherwise.
+        """
         total_price = self.shopping_cart.get_total_cart_price()
         if total_price > 0:
+            if not self.shopping_cart.commit():
+                print("Some items are no longer in stock. Nothing was checked out.")
+                return False
             print(f"Checking out... Your total is ${total_price}.")
-            self.shopping_cart.products = {}
+            self.shopping_cart.clear()
+            return True
         else:
             print("Your cart is empty. Nothing to checkout.")
+            return False
 
 # Test the e-commerce system
 product1 = Product("Keyboard", 50, 2)
@@ -145,3 +516,106 @@ customer.checkout()
 
 customer.add_to_cart(product1, -1)  # This should now give an error
 customer.remove_from_cart(product2, 3)  # This should now give an error
+
+class TestShoppingCartTotals(unittest.TestCase):
+
+    def test_running_totals_match_recomputation(self):
+        """Test 20,000 random cart and product changes keep every running total exact."""
+        rnd = random.Random(7)
+        products = [Product(f"p{i}", rnd.randint(1, 100), rnd.randint(0, 5)) for i in range(50)]
+        carts = [ShoppingCart() for _ in range(5)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(20000):
+                cart = rnd.choice(carts)
+                product = rnd.choice(products)
+                action = rnd.random()
+                if action < 0.4:
+                    cart.add_product(product, rnd.randint(0, 4))
+                elif action < 0.6:
+                    cart.remove_product(product, rnd.randint(0, 4))
+                elif action < 0.75:
+                    product.update_quantity(rnd.randint(-1, 6))
+                elif action < 0.9:
+                    product.price = rnd.randint(1, 100)
+                elif action < 0.92:
+                    cart.clear()
+                else:
+                    cart.products = {rnd.choice(products): 2}
+                for checked in carts:
+                    self.assertEqual(checked.get_total_cart_price(), checked.recompute_total_cart_price())
+
+    def test_float_prices_stay_consistent(self):
+        """Test a running total of float prices stays within rounding of the recomputation."""
+        rnd = random.Random(7)
+        product = Product("Cable", 0.1, 3)
+        cart = ShoppingCart()
+        for _ in range(10000):
+            cart.add_product(product, 1)
+            product.price = rnd.random()
+        self.assertTrue(cart.is_total_consistent())
+
+class TestReservations(unittest.TestCase):
+
+    def test_concurrent_checkouts_never_oversell(self):
+        """Test concurrent reserving checkouts keep stock non-negative and leave nothing reserved."""
+        products = [Product(f"p{i}", 10, 200) for i in range(4)]
+        sold = [0] * len(products)
+        sold_lock = threading.Lock()
+        threads_count = 8
+        barrier = threading.Barrier(threads_count)
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            cart = ShoppingCart()
+            barrier.wait()
+            for _ in range(150):
+                picks = {index: rnd.randint(1, 3) for index in rnd.sample(range(len(products)), 2)}
+                reserved = all(cart.reserve_product(products[index], quantity) for index, quantity in picks.items())
+                if reserved and cart.commit():
+                    with sold_lock:
+                        for index, quantity in picks.items():
+                            sold[index] += quantity
+                cart.clear()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        for product, product_sold in zip(products, sold):
+            self.assertGreaterEqual(product.quantity, 0)
+            self.assertEqual(product.quantity, 200 - product_sold)
+            self.assertEqual(product._reserved, 0)
+            self.assertLessEqual(len(product._reservations), 1)
+
+    def test_settled_reservations_leave_the_heap(self):
+        """Test committed and released reservations do not pile up until their TTL."""
+        product = Product("Keyboard", 50, 10 ** 6)
+        cart = ShoppingCart()
+        for _ in range(1000):
+            self.assertTrue(cart.reserve_product(product, 2))
+            cart.remove_product(product, 1)
+            self.assertTrue(cart.commit())
+            cart.clear()
+        self.assertLessEqual(len(product._reservations), 1)
+        self.assertEqual(product._reserved, 0)
+        self.assertEqual(product.quantity, 10 ** 6 - 1000)
+        _sweeper.sweep()
+        self.assertNotIn(product, _sweeper._products)
+
+    def test_expired_reservations_free_stock(self):
+        """Test an expired reservation gives its stock back and cannot be committed."""
+        product = Product("Mouse", 30, 5)
+        cart = ShoppingCart()
+        self.assertTrue(cart.reserve_product(product, 5, ttl=0))
+        self.assertEqual(product.get_available_quantity(), 5)
+        other = ShoppingCart()
+        self.assertTrue(other.reserve_product(product, 5))
+        self.assertFalse(cart.commit())
+        self.assertTrue(other.commit())
+        self.assertEqual((product.quantity, product._reserved), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,14 @@
+import bisect
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import unittest
+import weakref
+
 class FoodItem:
     """
     Represents a food item with a name and price.
@@ -5,10 +16,31 @@ class FoodItem:
     Attributes:
         name (str): The name of the food item.
         price (float): The price of the food item.
+
+    Note:
+        Setting price notifies the restaurants with the item on their menu.
     """
     def __init__(self, name, price):
         self.name = name
-        self.price = price
+        self._price = price
+        # Restaurants with this item on their menu, told about price changes
+        self._restaurants = weakref.WeakSet()
+
+    @property
+    def price(self):
+        """The price of the food item."""
+        return self._price
+
+    @price.setter
+    def price(self, new_price):
+        old_price = self._price
+        self._price = new_price
+        if new_price != old_price:
+            restaurants = list(self._restaurants)
+            for restaurant in restaurants:
+                restaurant._price_changed(self, old_price)
+            for restaurant in restaurants:
+                restaurant._price_settled(self)
 
 class Restaurant:
     """
@@ -21,19 +53,32 @@ class Restaurant:
     Methods:
         add_to_menu(food_item, quantity): Add a food item with a certain quantity to the menu.
         remove_from_menu(food_item, quantity): Remove a certain quantity of a food item from the menu.
-        get_total_revenue(): Calculate the total revenue generated from the menu.
+        get_total_revenue(): Get the total revenue generated from the menu.
+        recompute_total_revenue(): Calculate the total revenue from every line of the menu.
+
+    Note:
+        The revenue is kept up to date as the menu and the prices of its
+        food items change. Change the menu through its methods, not by
+        editing the menu dictionary in place.
     """
     def __init__(self, name):
         self.name = name
         self.menu = {}
+        self._total_revenue = 0
+        # Delivery services indexing this restaurant, told about menu changes
+        self._services = weakref.WeakSet()
 
     def add_to_menu(self, food_item, quantity):
         """Add a food item with a certain quantity to the menu."""
         if quantity >= 0:
+            old_quantity = self.menu.get(food_item)
             if food_item in self.menu:
                 self.menu[food_item] += quantity
             else:
                 self.menu[food_item] = quantity
+                food_item._restaurants.add(self)
+            self._total_revenue += food_item.price * quantity
+            self._menu_changed(food_item, old_quantity, self.menu[food_item])
         else:
             print("Invalid quantity value. Quantity cannot be negative.")
 
@@ -41,17 +86,44 @@ class Restaurant:
         """Remove a certain quantity of a food item from the menu."""
         if food_item in self.menu:
             if quantity >= 0:
+                old_quantity = self.menu[food_item]
                 if self.menu[food_item] <= quantity:
                     del self.menu[food_item]
+                    food_item._restaurants.discard(self)
                 else:
                     self.menu[food_item] -= quantity
+                self._total_revenue -= food_item.price * (old_quantity - self.menu.get(food_item, 0))
+                if not self.menu:
+                    # Drop rounding left over from the running float total
+                    self._total_revenue = 0
+                self._menu_changed(food_item, old_quantity, self.menu.get(food_item))
             else:
                 print("Invalid quantity value. Quantity cannot be negative.")
         else:
             print(f"{food_item.name} not found in the menu.")
 
+    def _menu_changed(self, food_item, old_quantity, new_quantity):
+        """Tell the delivery services about a menu line added, changed or removed (None quantity)."""
+        for service in list(self._services):
+            service._menu_changed(self, food_item, old_quantity, new_quantity)
+
+    def _price_changed(self, food_item, old_price):
+        """Update the revenue and tell the delivery services about the new price of a food item on the menu."""
+        self._total_revenue += (food_item.price - old_price) * self.menu[food_item]
+        for service in list(self._services):
+            service._price_changed(self, food_item, old_price)
+
+    def _price_settled(self, food_item):
+        """Tell the delivery services that every restaurant has the new price of a food item."""
+        for service in list(self._services):
+            service._price_settled(self, food_item)
+
     def get_total_revenue(self):
-        """Calculate the total revenue generated from the menu."""
+        """Get the total revenue generated from the menu."""
+        return self._total_revenue
+
+    def recompute_total_revenue(self):
+        """Calculate the total revenue generated from the menu from every line."""
         total_revenue = 0
         for food_item, quantity in self.menu.items():
             total_revenue += food_item.price * quantity
@@ -98,6 +170,10 @@ class Customer:
         else:
             print(f"{food_item.name} not found in the cart.")
 
+def _revenue_matches(running, recomputed, rel_tol):
+    """Check a running revenue total against a recomputed one."""
+    return math.isclose(running, recomputed, rel_tol=rel_tol, abs_tol=1e-9)
+
 class DeliveryService:
     """
     Represents a delivery service that manages a list of restaurants.
@@ -108,13 +184,210 @@ class DeliveryService:
     Methods:
         add_restaurant(restaurant): Add a restaurant to the list of managed restaurants.
         find_restaurant_by_name(name): Find a restaurant by its name in the list.
+        find_restaurants_serving(item_name): Find the restaurants with a food item on their menu.
+        find_items_by_price(min_price, max_price): Find the menu lines within a price range.
+        get_total_revenue(): Get the revenue of all restaurants.
+        get_item_revenue(item_name): Get the revenue of a food item across all restaurants.
+        export_revenue_snapshot(file_path): Get, and optionally save, the revenue rollups.
+        verify_revenue(): Cross-check the revenue rollups against a full recomputation.
+
+    Note:
+        The lookups and revenue rollups use indexes that the restaurants keep
+        current as their menus and the prices of their food items change, in
+        O(1) per change. Add restaurants through add_restaurant, not by
+        appending to the list.
     """
-    def __init__(self):
+    def __init__(self, verify=False):
+        """
+        Args:
+            verify (bool): Cross-check the revenue rollups against a full recomputation after every change.
+        """
         self.restaurants = []
+        self.verify = verify
+        self._total_revenue = 0
+        # Food item name -> revenue of the item across all restaurants
+        self._item_revenue = {}
+        # Restaurant name -> restaurants with that name, in the order added
+        self._by_name = {}
+        # Food item name -> {restaurant: quantity on its menu}
+        self._by_item = {}
+        # Food item name -> {restaurant: number of menu lines with that name},
+        # since different food items can share a name
+        self._item_lines = {}
+        # Price -> {(restaurant, food item): None} of the menu lines at that price,
+        # and the distinct prices in ascending order for range queries
+        self._by_price = {}
+        self._prices = []
 
     def add_restaurant(self, restaurant):
-        """Add a restaurant to the list of managed restaurants."""
+        """Add a restaurant to the list of managed restaurants, unless it is already managed."""
+        if self in restaurant._services:
+            return
         self.restaurants.append(restaurant)
+        self._by_name.setdefault(restaurant.name, []).append(restaurant)
+        restaurant._services.add(self)
+        for food_item, quantity in restaurant.menu.items():
+            self._index_menu_line(restaurant, food_item, None, quantity)
+        if self.verify:
+            for item_name in {food_item.name for food_item in restaurant.menu}:
+                self._verify_change(restaurant, item_name)
+
+    def _menu_changed(self, restaurant, food_item, old_quantity, new_quantity):
+        """Update the indexes for a menu line added, changed or removed (None quantity)."""
+        self._index_menu_line(restaurant, food_item, old_quantity, new_quantity)
+        if self.verify:
+            self._verify_change(restaurant, food_item.name)
+
+    def _index_menu_line(self, restaurant, food_item, old_quantity, new_quantity):
+        """Update the lookups and revenue rollups for a menu line added, changed or removed (None quantity)."""
+        serving = self._by_item.setdefault(food_item.name, {})
+        line_counts = self._item_lines.setdefault(food_item.name, {})
+        quantity = serving.get(restaurant, 0) - (old_quantity or 0) + (new_quantity or 0)
+        lines = line_counts.get(restaurant, 0) + (old_quantity is None) - (new_quantity is None)
+        revenue = food_item.price * ((new_quantity or 0) - (old_quantity or 0))
+        self._total_revenue += revenue
+        if lines:
+            serving[restaurant] = quantity
+            line_counts[restaurant] = lines
+            self._item_revenue[food_item.name] = self._item_revenue.get(food_item.name, 0) + revenue
+        else:
+            del serving[restaurant]
+            del line_counts[restaurant]
+            if serving:
+                self._item_revenue[food_item.name] += revenue
+            else:
+                del self._by_item[food_item.name]
+                del self._item_lines[food_item.name]
+                del self._item_revenue[food_item.name]
+
+        if old_quantity is None:
+            self._add_price_entry(food_item.price, restaurant, food_item)
+        elif new_quantity is None:
+            self._remove_price_entry(food_item.price, restaurant, food_item)
+
+    def _price_changed(self, restaurant, food_item, old_price):
+        """Update the revenue rollups and move a menu line to its new place in the price index."""
+        revenue = (food_item.price - old_price) * restaurant.menu[food_item]
+        self._total_revenue += revenue
+        self._item_revenue[food_item.name] += revenue
+        self._remove_price_entry(old_price, restaurant, food_item)
+        self._add_price_entry(food_item.price, restaurant, food_item)
+
+    def _price_settled(self, restaurant, food_item):
+        """Verify the rollups once every restaurant serving a food item has its new price."""
+        if self.verify:
+            self._verify_change(restaurant, food_item.name)
+
+    def _add_price_entry(self, price, restaurant, food_item):
+        """Add a menu line to the price index."""
+        lines = self._by_price.get(price)
+        if lines is None:
+            lines = self._by_price[price] = {}
+            bisect.insort(self._prices, price)
+        lines[(restaurant, food_item)] = None
+
+    def _remove_price_entry(self, price, restaurant, food_item):
+        """Remove a menu line from the price index."""
+        lines = self._by_price[price]
+        del lines[(restaurant, food_item)]
+        if not lines:
+            del self._by_price[price]
+            del self._prices[bisect.bisect_left(self._prices, price)]
+
+    def get_total_revenue(self):
+        """Get the revenue of all restaurants."""
+        return self._total_revenue
+
+    def get_item_revenue(self, item_name):
+        """
+        Get the revenue of a food item across all restaurants.
+
+        Args:
+            item_name (str): The name of the food item.
+
+        Returns:
+            float: The revenue of the item, 0 if no restaurant serves it.
+        """
+        return self._item_revenue.get(item_name, 0)
+
+    def export_revenue_snapshot(self, file_path=None):
+        """
+        Get the revenue rollups, and optionally save them as JSON.
+
+        Args:
+            file_path (str): The file to save the snapshot to, replaced atomically, or None to only return it.
+
+        Returns:
+            dict: The total revenue, the revenue by food item name and the revenue of each restaurant.
+        """
+        snapshot = {
+            "total_revenue": self._total_revenue,
+            "revenue_by_item": dict(self._item_revenue),
+            "restaurants": [
+                {"name": restaurant.name, "revenue": restaurant.get_total_revenue()}
+                for restaurant in self.restaurants
+            ],
+        }
+        if file_path is not None:
+            directory = os.path.dirname(os.path.abspath(file_path))
+            descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                if os.path.exists(file_path):
+                    os.chmod(temporary_path, os.stat(file_path).st_mode & 0o777)
+                with os.fdopen(descriptor, "w") as file:
+                    json.dump(snapshot, file, indent=4)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temporary_path, file_path)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+        return snapshot
+
+    def verify_revenue(self, rel_tol=1e-9):
+        """
+        Cross-check the revenue rollups against a full recomputation from the menus.
+
+        Args:
+            rel_tol (float): The relative difference allowed for rounding of float prices.
+
+        Returns:
+            list: A description of each rollup that does not match, empty if all match.
+        """
+        mismatches = []
+        item_revenue = {}
+        total_revenue = 0
+        for restaurant in self.restaurants:
+            revenue = restaurant.recompute_total_revenue()
+            total_revenue += revenue
+            if not _revenue_matches(restaurant.get_total_revenue(), revenue, rel_tol):
+                mismatches.append(f"{restaurant.name}: {restaurant.get_total_revenue()} != {revenue}")
+            for food_item, quantity in restaurant.menu.items():
+                item_revenue[food_item.name] = item_revenue.get(food_item.name, 0) + food_item.price * quantity
+        for item_name in item_revenue.keys() | self._item_revenue.keys():
+            expected = item_revenue.get(item_name, 0)
+            if item_name not in self._item_revenue or not _revenue_matches(self._item_revenue[item_name], expected, rel_tol):
+                mismatches.append(f"item {item_name}: {self._item_revenue.get(item_name)} != {expected}")
+        if not _revenue_matches(self._total_revenue, total_revenue, rel_tol):
+            mismatches.append(f"total: {self._total_revenue} != {total_revenue}")
+        return mismatches
+
+    def _verify_change(self, restaurant, item_name):
+        """Cross-check the rollups touched by a change against a recomputation, raising on a mismatch."""
+        expected = restaurant.recompute_total_revenue()
+        if not _revenue_matches(restaurant.get_total_revenue(), expected, 1e-9):
+            raise AssertionError(f"Revenue of {restaurant.name} is {restaurant.get_total_revenue()}, expected {expected}")
+        expected = sum(
+            food_item.price * quantity
+            for serving in self._by_item.get(item_name, {})
+            for food_item, quantity in serving.menu.items()
+            if food_item.name == item_name
+        )
+        if not _revenue_matches(self._item_revenue.get(item_name, 0), expected, 1e-9):
+            raise AssertionError(f"Revenue of {item_name} is {self._item_revenue.get(item_name, 0)}, expected {expected}")
+        expected = sum(restaurant.get_total_revenue() for restaurant in self.restaurants)
+        if not _revenue_matches(self._total_revenue, expected, 1e-9):
+            raise AssertionError(f"Total revenue is {self._total_revenue}, expected {expected}")
 
     def find_restaurant_by_name(self, name):
         """
@@ -126,10 +399,39 @@ class DeliveryService:
         Returns:
             Restaurant or None: The found restaurant or None if not found.
         """
-        for restaurant in self.restaurants:
-            if restaurant.name == name:
-                return restaurant
-        return None
+        restaurants = self._by_name.get(name)
+        return restaurants[0] if restaurants else None
+
+    def find_restaurants_serving(self, item_name):
+        """
+        Find the restaurants with a food item on their menu.
+
+        Args:
+            item_name (str): The name of the food item.
+
+        Returns:
+            dict: The restaurants serving the item, mapped to the quantity on their menu.
+        """
+        return dict(self._by_item.get(item_name, {}))
+
+    def find_items_by_price(self, min_price, max_price):
+        """
+        Find the menu lines whose price is within a range.
+
+        Args:
+            min_price (float): The lowest price to include.
+            max_price (float): The highest price to include.
+
+        Returns:
+            list: (food_item, restaurant, quantity) tuples, cheapest first.
+        """
+        start = bisect.bisect_left(self._prices, min_price)
+        end = bisect.bisect_right(self._prices, max_price)
+        return [
+            (food_item, restaurant, restaurant.menu[food_item])
+            for price in self._prices[start:end]
+            for restaurant, food_item in self._by_price[price]
+        ]
 
 # Test the food delivery system
 restaurant1 = Restaurant("Tasty Bites")
@@ -159,3 +461,88 @@ restaurant2.remove_from_menu(food_item1, 1)  # This should now give an error
 
 print("Total revenue for Tasty Bites:", restaurant1.get_total_revenue())
 print("Total revenue for Spice Delight:", restaurant2.get_total_revenue())
+
+class TestDeliveryService(unittest.TestCase):
+
+    def test_rollups_and_indexes_match_recomputation(self):
+        """Test 5,000 random menu, price and registration events keep every rollup and index exact."""
+        rnd = random.Random(9)
+        # Pairs of food items share a name, so a menu can have several lines per name.
+        items = [FoodItem(f"i{i % 15}", rnd.randint(1, 30)) for i in range(30)]
+        restaurants = [Restaurant(f"r{i}") for i in range(20)]
+        service = DeliveryService()
+        verifying = DeliveryService(verify=True)
+        for restaurant in restaurants[:10]:
+            service.add_restaurant(restaurant)
+            verifying.add_restaurant(restaurant)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(5000):
+                restaurant = rnd.choice(restaurants)
+                food_item = rnd.choice(items)
+                action = rnd.random()
+                if action < 0.45:
+                    restaurant.add_to_menu(food_item, rnd.randint(0, 5))
+                elif action < 0.85:
+                    restaurant.remove_from_menu(food_item, rnd.randint(0, 5))
+                elif action < 0.95:
+                    food_item.price = rnd.randint(1, 30)
+                elif restaurant not in service.restaurants:
+                    service.add_restaurant(restaurant)
+                self.assertEqual(service.verify_revenue(), [])
+                for item_name in ("i1", "i7"):
+                    expected = {
+                        serving: sum(quantity for item, quantity in serving.menu.items() if item.name == item_name)
+                        for serving in service.restaurants
+                        if any(item.name == item_name for item in serving.menu)
+                    }
+                    self.assertEqual(service.find_restaurants_serving(item_name), expected)
+                low = rnd.randint(0, 30)
+                high = low + rnd.randint(0, 10)
+                self.assertCountEqual(
+                    [(item, serving) for item, serving, _ in service.find_items_by_price(low, high)],
+                    [
+                        (item, serving)
+                        for serving in service.restaurants
+                        for item in serving.menu
+                        if low <= item.price <= high
+                    ],
+                )
+        self.assertEqual(verifying.verify_revenue(), [])
+        self.assertEqual(set(service._item_lines), set(service._by_item))
+
+    def test_adding_a_restaurant_twice_counts_it_once(self):
+        """Test a restaurant registered again is not listed or counted twice."""
+        restaurant = Restaurant("Tasty Bites")
+        with contextlib.redirect_stdout(io.StringIO()):
+            restaurant.add_to_menu(FoodItem("Momo", 5), 2)
+        service = DeliveryService(verify=True)
+        service.add_restaurant(restaurant)
+        service.add_restaurant(restaurant)
+        with contextlib.redirect_stdout(io.StringIO()):
+            restaurant.add_to_menu(FoodItem("Chowmein", 3), 1)
+        self.assertEqual(service.restaurants, [restaurant])
+        self.assertEqual(service.find_restaurants_serving("Momo"), {restaurant: 2})
+        self.assertEqual(service.export_revenue_snapshot()["total_revenue"], 13)
+        self.assertEqual(service.verify_revenue(), [])
+
+    def test_export_revenue_snapshot_keeps_the_file_mode(self):
+        """Test the snapshot replaces the file atomically and keeps its permissions."""
+        restaurant = Restaurant("Tasty Bites")
+        service = DeliveryService()
+        service.add_restaurant(restaurant)
+        with contextlib.redirect_stdout(io.StringIO()):
+            restaurant.add_to_menu(FoodItem("Momo", 5), 2)
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "revenue.json")
+            service.export_revenue_snapshot(file_path)
+            os.chmod(file_path, 0o640)
+            snapshot = service.export_revenue_snapshot(file_path)
+            self.assertEqual(os.stat(file_path).st_mode & 0o777, 0o640)
+            with open(file_path) as file:
+                self.assertEqual(json.load(file), snapshot)
+            self.assertEqual(os.listdir(directory), ["revenue.json"])
+        self.assertEqual(snapshot["total_revenue"], 10)
+
+if __name__ == '__main__':
+    unittest.main()